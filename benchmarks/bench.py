@@ -0,0 +1,72 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def compile_program(source, flags, opt, workdir, cc="cc"):
+    c_file = os.path.join(workdir, "program.c")
+    exe = os.path.join(workdir, "program")
+    with open(c_file, "w") as out:
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "generate.py"), source, *flags],
+            stdout=out,
+            check=True,
+        )
+    sources = [c_file] if "--unity" in flags else [c_file, os.path.join(ROOT, "bug.c")]
+    extra = ["-fopenmp"] if "--openmp" in flags else []
+    subprocess.run([cc, f"-O{opt}", "-w", *extra, "-I", ROOT, *sources, "-o", exe], check=True)
+    return exe
+
+
+def run_times(exe, repeat):
+    # Wall-clock time of each run, or None if the program was killed by a
+    # signal (e.g. a stack overflow). Runs in the executable's (temporary)
+    # directory so files it writes, like profiles, do not land in the repo.
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([exe], stdout=subprocess.DEVNULL, cwd=os.path.dirname(exe))
+        times.append(time.perf_counter() - start)
+        if result.returncode < 0:
+            return None
+    return times
+
+
+def time_program(exe, repeat):
+    times = run_times(exe, repeat)
+    return None if times is None else min(times)
+
+
+def parse_variant(text):
+    name, _, flags = text.partition("=")
+    return name, flags.split()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time a .bug program built with different generate.py flags")
+    arg_parser.add_argument("program")
+    arg_parser.add_argument("--variant", action="append", type=parse_variant, help="NAME=FLAGS, e.g. tail=--tail-calls")
+    arg_parser.add_argument("--opt", action="append", type=int, help="C optimization level (repeatable)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--cc", default="cc")
+    args = arg_parser.parse_args()
+
+    variants = args.variant or [("base", [])]
+    levels = args.opt or [0, 2]
+
+    for name, flags in variants:
+        for opt in levels:
+            with tempfile.TemporaryDirectory() as workdir:
+                exe = compile_program(args.program, flags, opt, workdir, args.cc)
+                best = time_program(exe, args.repeat)
+            result = "crashed" if best is None else f"{best * 1000:.2f} ms"
+            print(f"{name:<12} -O{opt}  {result}")
+
+
+if __name__ == "__main__":
+    main()
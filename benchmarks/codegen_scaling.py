@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+
+from bench import ROOT
+
+sys.path.insert(0, ROOT)
+
+from bug_parser import parse  # noqa: E402
+from generate import Visitor  # noqa: E402
+
+
+def synthesize(functions):
+    # A machine-generated style module: a few types and many independent
+    # functions calling their predecessors.
+    lines = [
+        "enum Kind {",
+        "  Small = 0,",
+        "  Large = 1",
+        "}",
+        "struct Pair {",
+        "  left: i32,",
+        "  right: i32",
+        "}",
+        "fn step0(x: i32) -> i32 {",
+        "  return x;",
+        "}",
+    ]
+    for i in range(1, functions):
+        lines += [
+            f"fn step{i}(x: i32, y: i32) -> i32 {{",
+            f"  let p: Pair = new Pair {{ left: x, right: y + {i} }};",
+            "  let total: i32 = 0;",
+            "  let n: i32 = 0;",
+            "  loop {",
+            "    if p.left > p.right {",
+            f"      total = total + step{i - 1}(n) * {i % 7 + 1};",
+            "    } else {",
+            "      total = total - p.right % 3;",
+            "    }",
+            "    n = n + 1;",
+            "  } while n < y;",
+            "  match total % 2 {",
+            "    0 => print_int(total),",
+            "    * => print_int(Large)",
+            "  };",
+            "  return total;",
+            "}",
+        ]
+    lines += ["fn main() -> i32 {", "  return step1(1, 2);", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time parallel code generation on a large synthetic module")
+    arg_parser.add_argument("--functions", type=int, default=20000)
+    arg_parser.add_argument("--max-jobs", type=int, default=os.cpu_count())
+    arg_parser.add_argument("--flags", default="", help="Visitor options: --optimized-c and/or --line-directives")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    flags = args.flags.split()
+    options = {
+        "optimized": "--optimized-c" in flags,
+        "source_name": "synthetic.bug" if "--line-directives" in flags else None,
+    }
+
+    start = time.perf_counter()
+    module = parse(synthesize(args.functions))
+    print(f"parsed {args.functions} functions in {time.perf_counter() - start:.2f} s")
+
+    counts = sorted({2 ** power for power in range(args.max_jobs.bit_length()) if 2 ** power <= args.max_jobs} | {args.max_jobs})
+    serial = None
+    baseline = None
+    failed = False
+    for jobs in counts:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            code = Visitor(jobs=jobs, **options).visit(module)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        if serial is None:
+            serial, baseline = code, best
+        identical = code == serial
+        failed = failed or not identical
+        print(
+            f"jobs {jobs:<3} {best:8.3f} s  speedup x{baseline / best:.2f}"
+            + ("" if identical else "  OUTPUT DIFFERS FROM SERIAL")
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import sys
+import time
+
+from bench import ROOT
+from codegen_scaling import synthesize
+
+sys.path.insert(0, ROOT)
+
+from bug_ast import *  # noqa: E402
+from bug_lazy import force, parse_lazy  # noqa: E402
+from bug_parser import parse  # noqa: E402
+from generate import Visitor  # noqa: E402
+
+LINES_PER_FUNCTION = 18
+
+
+def outline(module):
+    # What an outline view shows: every declaration with its signature.
+    visitor = Visitor()
+    entries = []
+    for decl in module.children:
+        if isinstance(decl, FnDeclAST):
+            entries.append((decl.lineno, visitor.signature(decl)))
+        elif isinstance(decl, (StructDeclAST, EnumDeclAST, VarDeclAST)):
+            entries.append((decl.lineno, decl.children[0]))
+    return entries
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time outline extraction with lazy and eager parsing")
+    arg_parser.add_argument("file", nargs="?", help=".bug file (default: a synthetic module)")
+    arg_parser.add_argument("--lines", type=int, default=1000000, help="size of the synthetic module")
+    arg_parser.add_argument("--eager", action="store_true", help="also time a full parse and check the lazy tree against it")
+    args = arg_parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            source = f.read()
+    else:
+        source = synthesize(max(args.lines // LINES_PER_FUNCTION, 2))
+    print(f"{source.count(chr(10))} lines")
+
+    lazy, seconds = timed(parse_lazy, source)
+    entries, outline_seconds = timed(outline, lazy)
+    print(f"lazy   {seconds + outline_seconds:8.2f} s  ({len(entries)} outline entries)")
+    if not args.eager:
+        return
+
+    eager, seconds = timed(parse, source)
+    eager_entries, outline_seconds = timed(outline, eager)
+    print(f"eager  {seconds + outline_seconds:8.2f} s")
+    _, seconds = timed(force, lazy)
+    print(f"force  {seconds:8.2f} s  (parsing every lazy body afterwards)")
+    if entries != eager_entries or pack(lazy.children) != pack(eager.children):
+        sys.exit("lazy and eager parses differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import glob
+import random
+import sys
+import time
+
+from bench import ROOT
+from suite import HERE
+
+sys.path.insert(0, ROOT)
+
+import bug_parser  # noqa: E402
+import bug_pratt  # noqa: E402
+from bug_ast import pack  # noqa: E402
+
+ENGINES = {"ply": bug_parser.parse, "pratt": bug_pratt.parse}
+BINARY = ["||", "&&", "==", "!=", "<", ">", "<=", ">=", "+", "-", "*", "/", "%"]
+TYPES = ["i32", "i64", "f32", "f64", "bool", "char", "string", "Point", "[i32; 4]", "[f64]", "*i32", "[[i32; 2]; 3]"]
+
+
+class ProgramGenerator:
+    # Random syntactically valid programs using every construct of the
+    # grammar, with random spacing and comments so positions are exercised.
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def space(self):
+        return self.random.choice([" ", " ", " ", "  ", "\n", "\n  ", " // note\n", "\t"])
+
+    def name(self):
+        return self.random.choice(["a", "b", "count", "x1", "_tmp", "value", "p", "items"])
+
+    def expr(self, depth=0):
+        choice = self.random.randrange(14 if depth < 3 else 4)
+        r = self.random
+        if choice == 0:
+            return str(r.randrange(1000))
+        if choice == 1:
+            return f"{r.randrange(100)}.{r.randrange(100)}"
+        if choice == 2:
+            return self.name()
+        if choice == 3:
+            return r.choice(["true", "false", '"text"', "'c'", '"true"'])
+        if choice in (4, 5, 6):
+            return f"{self.expr(depth + 1)}{self.space()}{r.choice(BINARY)}{self.space()}{self.expr(depth + 1)}"
+        if choice == 7:
+            return f"{r.choice(['!', '-', '+'])}{self.expr(depth + 1)}"
+        if choice == 8:
+            return f"({self.expr(depth + 1)})"
+        if choice == 9:
+            args = ", ".join(self.expr(depth + 1) for _ in range(r.randrange(3)))
+            return f"{self.name()}({args})"
+        if choice == 10:
+            return f"{self.expr(depth + 1)}.{self.name()}"
+        if choice == 11:
+            return f"{self.expr(depth + 1)}[{self.expr(depth + 1)}]"
+        if choice == 12:
+            arms = [f"{self.expr(depth + 1)} => {self.expr(depth + 1)}" for _ in range(r.randrange(1, 3))]
+            if r.random() < 0.5:
+                arms.append(f"* => {self.expr(depth + 1)}")
+            return f"match {self.name()} {{{self.space()}{','.join(arms)}{self.space()}}}"
+        if r.random() < 0.5:
+            return "[" + ", ".join(self.expr(depth + 1) for _ in range(r.randrange(3))) + "]"
+        fields = ", ".join(f"{self.name()}: {self.expr(depth + 1)}" for _ in range(r.randrange(1, 3)))
+        return f"new Point {{ {fields} }}"
+
+    def target(self):
+        choice = self.random.randrange(3)
+        if choice == 0:
+            return self.name()
+        if choice == 1:
+            return f"{self.name()}[{self.expr(2)}]"
+        return f"{self.name()}.{self.name()}"
+
+    def stmt(self, depth):
+        r = self.random
+        choice = r.randrange(8 if depth < 2 else 5)
+        if choice == 0:
+            return f"let {self.name()}: {r.choice(TYPES)} = {self.expr()};"
+        if choice == 1:
+            return f"{self.target()}{self.space()}={self.space()}{self.expr()};"
+        if choice == 2:
+            return f"return {self.expr()};"
+        if choice == 3:
+            return f"{self.expr()};"
+        if choice == 4:
+            return ";"
+        if choice == 5:
+            text = f"if {self.expr()} {{{self.space()}{self.body(depth + 1)}}}"
+            while r.random() < 0.3:
+                text += f" else if {self.expr()} {{ {self.body(depth + 1)} }}"
+            if r.random() < 0.5:
+                text += f" else {{ {self.body(depth + 1)} }}"
+            return text
+        return f"loop {{{self.space()}{self.body(depth + 1)}}} while {self.expr()};"
+
+    def body(self, depth=0):
+        return self.space().join(self.stmt(depth) for _ in range(self.random.randint(1, 4))) + self.space()
+
+    def decl(self):
+        r = self.random
+        choice = r.randrange(5)
+        attrs = "".join(f"@{r.choice(['pure', 'export', 'repr_c'])}{self.space()}" for _ in range(r.randrange(2)))
+        if choice == 0:
+            fields = ",\n  ".join(f"{self.name()}: {r.choice(TYPES)}" for _ in range(r.randint(1, 3)))
+            return f"{attrs}struct Point {{\n  {fields}\n}}"
+        if choice == 1:
+            variants = ", ".join(f"V{i} = {i}" for i in range(r.randint(1, 3)))
+            return f"{attrs}enum Kind {{ {variants} }}"
+        if choice == 2:
+            return f"let {self.name()}: {r.choice(TYPES)} = {self.expr()};"
+        if choice == 3:
+            return ";"
+        params = ", ".join(f"{self.name()}: {r.choice(TYPES)}" for _ in range(r.randrange(3)))
+        ret = r.choice(["", f" -> {r.choice(TYPES)}", " -> void"])
+        return f"{attrs}fn {self.name()}({params}){ret} {{\n  {self.body()}\n}}"
+
+    def program(self, decls):
+        return "\n\n".join(self.decl() for _ in range(decls)) + "\n"
+
+
+def check(sources):
+    mismatches = 0
+    for label, source in sources:
+        expected = bug_parser.parse(source)
+        actual = bug_pratt.parse(source)
+        if expected is None or actual is None or pack(expected.children) != pack(actual.children):
+            mismatches += 1
+            print(f"MISMATCH {label}")
+    return mismatches
+
+
+def throughput(source, repeat):
+    size = len(source.encode())
+    for name, parse in ENGINES.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(source)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:<6} {best:8.3f} s  {size / best / 1e6:6.2f} MB/s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Check the Pratt parser against PLY and compare their throughput")
+    arg_parser.add_argument("--programs", type=int, default=500, help="random programs in the differential corpus")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    generator = ProgramGenerator(args.seed)
+    corpus = [(f"random program {i} (seed {args.seed})", generator.program(8)) for i in range(args.programs)]
+    for path in sorted(glob.glob(f"{HERE}/*.bug")) + [f"{ROOT}/example.bug"]:
+        with open(path) as f:
+            corpus.append((path, f.read()))
+    mismatches = check(corpus)
+    print(f"{len(corpus)} programs, {mismatches} mismatches")
+
+    throughput("\n".join(source for _, source in corpus), args.repeat)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
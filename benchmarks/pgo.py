@@ -0,0 +1,58 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench import compile_program, time_program
+from suite import HERE, programs
+
+
+def profile_program(source, flags, opt, workdir, cc):
+    # Builds with --instrument, runs the training run and returns the
+    # profile path together with the instrumented program's output.
+    exe = compile_program(source, flags + ["--instrument"], opt, workdir, cc)
+    profile = os.path.join(workdir, "bug.profile")
+    result = subprocess.run(
+        [exe], capture_output=True, text=True, env=dict(os.environ, BUG_PROFILE=profile), check=True
+    )
+    return profile, result.stdout
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare regular and profile-guided builds of the benchmark programs")
+    arg_parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    arg_parser.add_argument("--flags", default="", help="generate.py flags used by every build")
+    arg_parser.add_argument("--opt", action="append", type=int, help="C optimization level (repeatable, default 2)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--cc", default="cc")
+    args = arg_parser.parse_args()
+
+    flags = args.flags.split()
+    levels = args.opt or [2]
+    failed = False
+    for name in programs(args.names):
+        source = os.path.join(HERE, name + ".bug")
+        with open(os.path.join(HERE, name + ".expected")) as f:
+            expected = f.read()
+        for opt in levels:
+            with tempfile.TemporaryDirectory() as workdir:
+                profile, output = profile_program(source, flags, opt, workdir, args.cc)
+                if output != expected:
+                    print(f"{name:<16} -O{opt}  instrumented build: wrong output")
+                    failed = True
+                    continue
+                base = time_program(compile_program(source, flags, opt, workdir, args.cc), args.repeat)
+                exe = compile_program(source, flags + ["--profile-use", profile], opt, workdir, args.cc)
+                if subprocess.run([exe], capture_output=True, text=True).stdout != expected:
+                    print(f"{name:<16} -O{opt}  profile-guided build: wrong output")
+                    failed = True
+                    continue
+                pgo = time_program(exe, args.repeat)
+            print(f"{name:<16} -O{opt}  base {base * 1000:9.2f} ms  pgo {pgo * 1000:9.2f} ms  x{base / pgo:.2f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
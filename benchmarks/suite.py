@@ -0,0 +1,130 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench import ROOT, compile_program, run_times
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def programs(names, update_golden=False):
+    # Every benchmarks/<name>.bug with a golden <name>.expected output; new
+    # programs can be named explicitly together with --update-golden.
+    sources = sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(HERE, "*.bug"))
+    )
+    found = [name for name in sources if os.path.exists(os.path.join(HERE, name + ".expected"))]
+    if names:
+        known = sources if update_golden else found
+        missing = set(names) - set(known)
+        if missing:
+            sys.exit(f"unknown benchmark(s): {', '.join(sorted(missing))}")
+        return [name for name in known if name in names]
+    return found
+
+
+def run_program(name, flags, opt, repeat, cc, update_golden):
+    source = os.path.join(HERE, name + ".bug")
+    golden = os.path.join(HERE, name + ".expected")
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            exe = compile_program(source, flags, opt, workdir, cc)
+        except subprocess.CalledProcessError:
+            return {"status": "build failed"}
+
+        # Run inside the temporary directory so files the program writes,
+        # such as the profile of an --instrument build, are cleaned up.
+        result = subprocess.run([exe], capture_output=True, text=True, cwd=workdir)
+        if result.returncode < 0:
+            return {"status": "crashed"}
+        if update_golden:
+            with open(golden, "w") as f:
+                f.write(result.stdout)
+        with open(golden) as f:
+            if result.stdout != f.read():
+                return {"status": "wrong output"}
+
+        times = run_times(exe, repeat)
+    if times is None:
+        return {"status": "crashed"}
+    return {"status": "ok", "best": min(times), "median": statistics.median(times)}
+
+
+def compare(results, baseline, threshold):
+    # Returns the (program, level, ratio) entries that got slower than the
+    # baseline by more than `threshold`.
+    regressions = []
+    for name, levels in results["results"].items():
+        for level, entry in levels.items():
+            before = baseline["results"].get(name, {}).get(level)
+            if entry["status"] != "ok" or not before or before["status"] != "ok":
+                continue
+            ratio = entry["best"] / before["best"]
+            print(f"{name:<16} {level}  {before['best'] * 1000:9.2f} -> {entry['best'] * 1000:9.2f} ms  x{ratio:.2f}")
+            if ratio > 1 + threshold:
+                regressions.append((name, level, ratio))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run the generated-code benchmark suite")
+    arg_parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    arg_parser.add_argument("--flags", default="", help="extra generate.py flags, e.g. '--optimized-c --unity'")
+    arg_parser.add_argument("--opt", action="append", type=int, help="C optimization level (repeatable, default 0 1 2 3)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--cc", default="cc")
+    arg_parser.add_argument("--json", help="write results to this file")
+    arg_parser.add_argument("--compare", help="baseline results file to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a regression is reported")
+    arg_parser.add_argument("--update-golden", action="store_true", help="rewrite the .expected files from this run")
+    args = arg_parser.parse_args()
+
+    flags = args.flags.split()
+    levels = args.opt or [0, 1, 2, 3]
+    results = {
+        "meta": {
+            "flags": flags,
+            "cc": args.cc,
+            "repeat": args.repeat,
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+        },
+        "results": {},
+    }
+
+    failed = False
+    for name in programs(args.names, args.update_golden):
+        results["results"][name] = {}
+        for opt in levels:
+            entry = run_program(name, flags, opt, args.repeat, args.cc, args.update_golden)
+            results["results"][name][f"O{opt}"] = entry
+            if entry["status"] == "ok":
+                print(f"{name:<16} -O{opt}  best {entry['best'] * 1000:9.2f} ms  median {entry['median'] * 1000:9.2f} ms")
+            else:
+                print(f"{name:<16} -O{opt}  {entry['status']}")
+                failed = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, level, ratio in regressions:
+            print(f"REGRESSION {name} {level}: {ratio:.2f}x slower")
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
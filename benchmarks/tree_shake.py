@@ -0,0 +1,86 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import ROOT
+
+GROUP = 10
+
+
+def synthesize(functions, used):
+    # A shared library of modules: GROUP functions per module, each calling
+    # the previous one, with the module's own struct and enum. main calls
+    # into the first `used` modules only.
+    lines = []
+    for group in range(-(-functions // GROUP)):
+        lines += [
+            f"enum Mode{group} {{ Plain{group} = 0, Scaled{group} = {group + 1} }}",
+            f"struct Acc{group} {{ total: i32, count: i32 }}",
+        ]
+        for i in range(group * GROUP, min((group + 1) * GROUP, functions)):
+            previous = f"lib{i - 1}(x - 1, y)" if i % GROUP else f"Scaled{group}"
+            lines += [
+                f"fn lib{i}(x: i32, y: i32) -> i32 {{",
+                f"  let acc: Acc{group} = new Acc{group} {{ total: 0, count: 0 }};",
+                "  loop {",
+                "    if acc.count % 2 == 0 {",
+                f"      acc.total = acc.total + x * {i % 7 + 1};",
+                "    } else {",
+                f"      acc.total = acc.total - y % {i % 5 + 2};",
+                "    }",
+                "    acc.count = acc.count + 1;",
+                "  } while acc.count < y;",
+                f"  return acc.total + {previous};",
+                "}",
+            ]
+    lines.append("fn main() -> i32 {")
+    lines += [f"  print_int(lib{min((group + 1) * GROUP, functions) - 1}(3, 4));" for group in range(used)]
+    lines += ["  return 0;", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def generate(source, flags, workdir):
+    c_file = os.path.join(workdir, "program.c")
+    with open(c_file, "w") as out:
+        subprocess.run([sys.executable, os.path.join(ROOT, "generate.py"), source, *flags], stdout=out, check=True)
+    return c_file
+
+
+def compile_time(c_file, opt, cc, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([cc, f"-O{opt}", "-w", "-c", "-I", ROOT, c_file, "-o", c_file + ".o"], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time C compilation of a module that is mostly unused library code, with and without --tree-shake")
+    arg_parser.add_argument("file", nargs="?", help=".bug file (default: a synthetic library mostly unused by main)")
+    arg_parser.add_argument("--functions", type=int, default=2000, help="functions in the synthetic library")
+    arg_parser.add_argument("--used", type=int, default=5, help=f"library modules of {GROUP} functions main calls into")
+    arg_parser.add_argument("--flags", default="", help="extra generate.py flags")
+    arg_parser.add_argument("--opt", type=int, default=2)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--cc", default="cc")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = args.file
+        if source is None:
+            source = os.path.join(workdir, "library.bug")
+            with open(source, "w") as f:
+                f.write(synthesize(args.functions, args.used))
+        for name, flags in (("full", []), ("shaken", ["--tree-shake"])):
+            c_file = generate(source, args.flags.split() + flags, workdir)
+            size = os.path.getsize(c_file)
+            seconds = compile_time(c_file, args.opt, args.cc, args.repeat)
+            print(f"{name:<7} {size / 1024:9.1f} KiB of C  -O{args.opt} compile {seconds:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,41 @@
 #include <stdio.h>
+#include <stdlib.h>
 #include "bug.h"
 
-void println(char* str) {
+BUG_API void println(char* str) {
     printf("%s\n", str);
 }
 
-void print_int(int str) {
+BUG_API void print_int(int str) {
     printf("%d", str);
+}
+
+BUG_API void print_f64(double value) {
+    printf("%.9f", value);
+}
+
+static const char** bug_profile_names;
+static long long* bug_profile_counters;
+static int bug_profile_count;
+static const char* bug_profile_path;
+
+static void bug_profile_dump(void) {
+    const char* path = getenv("BUG_PROFILE");
+    FILE* out = fopen(path ? path : bug_profile_path, "w");
+    if (!out) {
+        perror("bug profile");
+        return;
+    }
+    for (int i = 0; i < bug_profile_count; i++) {
+        fprintf(out, "%s %lld\n", bug_profile_names[i], bug_profile_counters[i]);
+    }
+    fclose(out);
+}
+
+BUG_API void bug_profile_register(const char** names, long long* counters, int count, const char* path) {
+    bug_profile_names = names;
+    bug_profile_counters = counters;
+    bug_profile_count = count;
+    bug_profile_path = path;
+    atexit(bug_profile_dump);
 }
\ No newline at end of file
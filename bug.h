@@ -1,7 +1,26 @@
 #ifndef BUG_H
 #define BUG_H
 
-void println(char* str);
-void print_int(int str);
+#include <stdbool.h>
+
+// Unity builds define BUG_API as `static inline` before pasting the runtime
+// into the generated file.
+#ifndef BUG_API
+#define BUG_API
+#endif
+
+BUG_API void println(char* str);
+BUG_API void print_int(int str);
+BUG_API void print_f64(double value);
+
+// Counters of instrumented builds (generate.py --instrument). The generated
+// file defines bug_probe_counters and registers it from main; the counts are
+// written to $BUG_PROFILE, or else the --profile-output path baked into the
+// binary (default bug.profile), when the program exits.
+#define BUG_COUNT(id) (bug_probe_counters[id]++)
+#define BUG_BRANCH(id, cond) ((cond) ? (bug_probe_counters[id]++, 1) : (bug_probe_counters[(id) + 1]++, 0))
+#define BUG_ARM(id, expr) (bug_probe_counters[id]++, (expr))
+
+BUG_API void bug_profile_register(const char** names, long long* counters, int count, const char* path);
 
 #endif
\ No newline at end of file
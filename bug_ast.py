@@ -2,6 +2,8 @@ class BaseAST:
     def __init__(self):
         self.parent = None
         self.children = []
+        self.lineno = None
+        self.col = None
 
     def add_child(self, child):
         self.children.append(child)
@@ -62,6 +64,7 @@ class ModuleAST(BaseAST):
 class DeclAST(BaseAST):
     def __init__(self):
         super().__init__()
+        self.attrs = set()
 
 class FnDeclAST(DeclAST):
     def __init__(self, name, params, ret_type, body):
@@ -79,6 +82,9 @@ class VarDeclAST(DeclAST):
         self.add_child(_type)
         self.add_child(value)
 
+class ConstTableDeclAST(VarDeclAST):
+    pass
+
 class StructDeclAST(DeclAST):
     def __init__(self, name, fields):
         super().__init__()
@@ -250,3 +256,97 @@ class AssignStmtAST(StatementAST):
         self.add_child(name)
         self.add_child(expr)
 
+
+
+class BlockStmtAST(StatementAST):
+    def __init__(self, body):
+        super().__init__()
+        self.add_child(body)
+
+class ParallelLoopStmtAST(StatementAST):
+    # A counted loop `for (counter = current; counter op limit; counter++)`
+    # emitted as an OpenMP loop; `mode` is the construct ("parallel for",
+    # "simd", ...) and `reductions` a list of (operator, variable) pairs.
+    def __init__(self, counter, counter_type, op, limit, body, mode, reductions=()):
+        super().__init__()
+        self.add_child(counter)
+        self.add_child(counter_type)
+        self.add_child(op)
+        self.add_child(limit)
+        self.add_child(body)
+        self.mode = mode
+        self.reductions = list(reductions)
+
+class GotoStmtAST(StatementAST):
+    def __init__(self, label):
+        super().__init__()
+        self.add_child(label)
+
+class LabelStmtAST(StatementAST):
+    def __init__(self, label):
+        super().__init__()
+        self.add_child(label)
+
+
+def walk(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from walk(item)
+    elif isinstance(node, BaseAST):
+        yield node
+        for child in node.children:
+            yield from walk(child)
+
+def clone(node):
+    if isinstance(node, list):
+        return [clone(item) for item in node]
+    if not isinstance(node, BaseAST):
+        return node
+    copy = node.__class__.__new__(node.__class__)
+    copy.__dict__.update(node.__dict__)
+    copy.parent = None
+    copy.children = []
+    for child in node.children:
+        copy.add_child(clone(child))
+    return copy
+
+# Python types stored in LiteralAST nodes.
+LITERAL_TYPES = {_type.__name__: _type for _type in (int, float, bool, str)}
+
+def pack(node):
+    # A parent-free form of the tree made of tuples, lists and plain values,
+    # cheap to send to another process. Nodes become
+    # (class name, lineno, col, children, other attributes or None) and
+    # Python types a 1-tuple of their name.
+    if isinstance(node, list):
+        return [pack(item) for item in node]
+    if isinstance(node, type):
+        return (node.__name__,)
+    if not isinstance(node, BaseAST):
+        return node
+    extra = {
+        key: value
+        for key, value in node.__dict__.items()
+        if key not in ("parent", "children", "lineno", "col")
+    }
+    return (type(node).__name__, node.lineno, node.col, [pack(child) for child in node.children], extra or None)
+
+def unpack(data):
+    if isinstance(data, list):
+        return [unpack(item) for item in data]
+    if not isinstance(data, tuple):
+        return data
+    if len(data) == 1:
+        return LITERAL_TYPES[data[0]]
+    name, lineno, col, children, extra = data
+    cls = globals()[name]
+    node = cls.__new__(cls)
+    node.parent = None
+    node.children = []
+    node.lineno = lineno
+    node.col = col
+    if extra:
+        node.__dict__.update(extra)
+    for child in children:
+        node.add_child(unpack(child))
+    return node
@@ -0,0 +1,82 @@
+from bug_ast import CallExprAST, FnDeclAST, walk
+
+
+class CallGraph:
+    def __init__(self, module):
+        self.functions = {}
+        self.calls = {}
+        for decl in module.children:
+            if isinstance(decl, FnDeclAST):
+                self.functions[decl.children[0]] = decl
+
+        for name, fn in self.functions.items():
+            self.calls[name] = [
+                node for node in walk(fn.children[3]) if isinstance(node, CallExprAST)
+            ]
+
+    def callees(self, name):
+        return {
+            call.children[0]
+            for call in self.calls.get(name, [])
+            if call.children[0] in self.functions
+        }
+
+    def callers(self, name):
+        return {
+            caller
+            for caller, calls in self.calls.items()
+            if any(call.children[0] == name for call in calls)
+        }
+
+    def call_count(self, name):
+        return sum(
+            1
+            for calls in self.calls.values()
+            for call in calls
+            if call.children[0] == name
+        )
+
+    def sccs(self):
+        # Tarjan's algorithm; components come out callees first.
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+
+        def connect(name):
+            index[name] = lowlink[name] = len(index)
+            stack.append(name)
+            on_stack.add(name)
+            for callee in sorted(self.callees(name)):
+                if callee not in index:
+                    connect(callee)
+                    lowlink[name] = min(lowlink[name], lowlink[callee])
+                elif callee in on_stack:
+                    lowlink[name] = min(lowlink[name], index[callee])
+
+            if lowlink[name] == index[name]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == name:
+                        break
+                components.append(component)
+
+        for name in self.functions:
+            if name not in index:
+                connect(name)
+
+        return components
+
+    def recursive(self):
+        names = set()
+        for component in self.sccs():
+            if len(component) > 1 or component[0] in self.callees(component[0]):
+                names.update(component)
+        return names
+
+    def bottom_up(self):
+        return [name for component in self.sccs() for name in component]
@@ -0,0 +1,174 @@
+from bug_ast import *
+from bug_inline import hoistable_expr, nested_bodies, replace_node
+from bug_types import TypeEnv
+
+
+class Expr:
+    # A pure expression as seen by the CSE pass: its structural key, the
+    # variables it reads and whether it reads memory (arrays, fields).
+    def __init__(self, key, names, memory, size):
+        self.key = key
+        self.names = names
+        self.memory = memory
+        self.size = size
+
+
+class CommonSubexpressionEliminator:
+    def __init__(self):
+        self.report = []
+        self.counter = 0
+
+    def run(self, module):
+        self.env = TypeEnv(module)
+        self.pure = {
+            decl.children[0]
+            for decl in module.children
+            if isinstance(decl, FnDeclAST) and "pure" in decl.attrs
+        }
+        for decl in module.children:
+            if isinstance(decl, FnDeclAST):
+                self.env.enter(decl)
+                self.fn = decl.children[0]
+                self.eliminate(decl.children[3])
+        return self.report
+
+    def describe(self, node):
+        if isinstance(node, LiteralAST):
+            return Expr(("literal", node.children[0], node.children[1]), frozenset(), False, 1)
+        if isinstance(node, VarRefAST):
+            # A whole array or pointer (e.g. passed to a @pure call) reads
+            # the memory behind it, which impure calls may write.
+            _type = self.env.lookup(node.children[0])
+            memory = _type is not None and _type.children[0] in ("array", "ptr")
+            return Expr(("var", node.children[0]), frozenset([node.children[0]]), memory, 1)
+
+        if isinstance(node, BinOpAST):
+            key, operands = ("binop", node.children[0]), node.children[1:]
+        elif isinstance(node, UnOpAST):
+            key, operands = ("unop", node.children[0]), node.children[1:]
+        elif isinstance(node, ArrayAccessExprAST):
+            key, operands = ("index",), node.children
+        elif isinstance(node, FieldAccessExprAST):
+            key, operands = ("field", node.children[1]), node.children[:1]
+        elif isinstance(node, CallExprAST) and node.children[0] in self.pure:
+            key, operands = ("call", node.children[0]), node.children[1]
+        else:
+            return None
+
+        parts = [self.describe(operand) for operand in operands]
+        if any(part is None for part in parts):
+            return None
+        return Expr(
+            key + tuple(part.key for part in parts),
+            frozenset().union(*(part.names for part in parts)),
+            # @pure functions may read globals and memory behind pointers.
+            isinstance(node, (ArrayAccessExprAST, FieldAccessExprAST, CallExprAST)) or any(part.memory for part in parts),
+            1 + sum(part.size for part in parts),
+        )
+
+    def occurrences(self, node, found, conditional=False):
+        # Collects the pure, non-trivial subexpressions evaluated on every
+        # path through `node`; conditionally evaluated ones are left alone.
+        if isinstance(node, list):
+            for item in node:
+                self.occurrences(item, found, conditional)
+            return
+        if not isinstance(node, BaseAST):
+            return
+        if not conditional and not isinstance(node, (LiteralAST, VarRefAST)):
+            expr = self.describe(node)
+            if expr is not None:
+                found.append((expr, node))
+
+        if isinstance(node, BinOpAST) and node.children[0] in ("&&", "||"):
+            self.occurrences(node.children[1], found, conditional)
+            self.occurrences(node.children[2], found, True)
+        elif isinstance(node, MatchExprAST):
+            self.occurrences(node.children[0], found, conditional)
+            self.occurrences(node.children[1], found, True)
+        else:
+            for child in node.children:
+                self.occurrences(child, found, conditional)
+
+    def has_side_effects(self, node):
+        return any(
+            isinstance(child, CallExprAST) and child.children[0] not in self.pure
+            for child in walk(node)
+        )
+
+    def clobbered_by_calls(self, expr):
+        return expr.memory or any(not self.env.is_local(name) for name in expr.names)
+
+    def groups(self, body):
+        # Splits the uses of each expression into runs that see the same
+        # value: a run ends when a variable it reads is written, when an
+        # impure call may have changed memory or globals, or at control flow.
+        live = {}
+        groups = []
+
+        def kill(predicate):
+            for key in [key for key, (expr, _) in live.items() if predicate(expr)]:
+                groups.append(live.pop(key))
+
+        for index, stmt in enumerate(body):
+            expr_node = hoistable_expr(stmt)
+            impure = expr_node is not None and self.has_side_effects(expr_node)
+            if impure:
+                kill(self.clobbered_by_calls)
+
+            found = []
+            self.occurrences(expr_node, found)
+            for expr, node in found:
+                if impure and self.clobbered_by_calls(expr):
+                    continue
+                live.setdefault(expr.key, (expr, []))[1].append((index, node))
+
+            if impure:
+                kill(self.clobbered_by_calls)
+            if isinstance(stmt, (VarDeclAST, AssignStmtAST)):
+                target = stmt.children[0]
+                if isinstance(target, str):
+                    is_global = not self.env.is_local(target)
+                    kill(lambda expr: target in expr.names or is_global and expr.memory)
+                else:
+                    roots = {node.children[0] for node in walk(target) if isinstance(node, VarRefAST)}
+                    kill(lambda expr: expr.memory or expr.names & roots)
+            if nested_bodies(stmt):
+                kill(lambda expr: True)
+
+        kill(lambda expr: True)
+        return groups
+
+    def eliminate(self, body):
+        for nested in [nested for stmt in body for nested in nested_bodies(stmt)]:
+            self.eliminate(nested)
+
+        skipped = set()
+        while True:
+            candidates = [
+                (expr, uses)
+                for expr, uses in self.groups(body)
+                if len(uses) > 1 and (expr.key, uses[0][1]) not in skipped
+            ]
+            if not candidates:
+                return
+
+            expr, uses = max(candidates, key=lambda candidate: candidate[0].size)
+            index, first = uses[0]
+            _type = self.env.infer(first)
+            if _type is None or _type.children[0] in ("array", "void"):
+                skipped.add((expr.key, first))
+                continue
+
+            self.counter += 1
+            name = f"_cse{self.counter}"
+            self.env.locals[name] = _type
+            for stmt_index, node in uses:
+                replace_node(body[stmt_index], node, VarRefAST(name))
+            body.insert(index, VarDeclAST(name, clone(_type), first))
+            self.report.append((self.fn, name, len(uses)))
+
+    def format_report(self):
+        return "\n".join(
+            f"{fn}: {name} replaces {count} evaluations" for fn, name, count in self.report
+        )
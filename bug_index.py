@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+
+from bug_ast import *
+from bug_parser import parse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS symbols (id INTEGER PRIMARY KEY, path TEXT, kind TEXT, name TEXT, signature TEXT, line INTEGER, col INTEGER);
+CREATE TABLE IF NOT EXISTS members (symbol INTEGER, name TEXT, detail TEXT, line INTEGER, col INTEGER);
+CREATE TABLE IF NOT EXISTS calls (path TEXT, caller TEXT, callee TEXT, line INTEGER, col INTEGER);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS members_symbol ON members (symbol);
+CREATE INDEX IF NOT EXISTS calls_callee ON calls (callee);
+CREATE INDEX IF NOT EXISTS calls_path ON calls (path);
+"""
+
+# Sorts after every character a name can contain, for prefix ranges.
+LAST_CHAR = "\U0010ffff"
+
+
+def format_type(_type):
+    if _type is None:
+        return "void"
+    kind = _type.children[0]
+    if kind == "array":
+        if len(_type.children) == 3:
+            return f"[{format_type(_type.children[1])}; {_type.children[2]}]"
+        return f"[{format_type(_type.children[1])}]"
+    if kind == "ptr":
+        return "*" + format_type(_type.children[1])
+    return kind
+
+
+def signature(decl):
+    if isinstance(decl, FnDeclAST):
+        name, params, ret_type, _ = decl.children
+        params = ", ".join(f"{param.children[0]}: {format_type(param.children[1])}" for param in params)
+        return "".join(f"@{attr} " for attr in sorted(decl.attrs)) + f"fn {name}({params}) -> {format_type(ret_type)}"
+    if isinstance(decl, StructDeclAST):
+        return f"struct {decl.children[0]}"
+    if isinstance(decl, EnumDeclAST):
+        return f"enum {decl.children[0]}"
+    return f"let {decl.children[0]}: {format_type(decl.children[1])}"
+
+
+def bug_files(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.endswith(".bug"):
+                    yield os.path.abspath(os.path.join(directory, name))
+
+
+class SymbolIndex:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(self, roots):
+        # Reindexes the .bug files under `roots` whose size or mtime changed
+        # and whose content hash differs from the indexed one, and drops
+        # files that no longer exist. Returns (parsed, unchanged, removed).
+        known = {row[0]: row[1:] for row in self.db.execute("SELECT path, mtime, size, hash FROM files")}
+        parsed = unchanged = removed = 0
+        with self.db:
+            for path in bug_files(roots):
+                stat = os.stat(path)
+                entry = known.get(path)
+                if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                    unchanged += 1
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                if entry is not None and entry[2] == digest:
+                    self.db.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?", (stat.st_mtime_ns, stat.st_size, path))
+                    unchanged += 1
+                    continue
+                self.remove(path)
+                self.index_file(path, data.decode())
+                self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (path, stat.st_mtime_ns, stat.st_size, digest))
+                parsed += 1
+
+            for path in known:
+                if not os.path.exists(path):
+                    self.remove(path)
+                    removed += 1
+        return parsed, unchanged, removed
+
+    def remove(self, path):
+        self.db.execute("DELETE FROM members WHERE symbol IN (SELECT id FROM symbols WHERE path = ?)", (path,))
+        self.db.execute("DELETE FROM symbols WHERE path = ?", (path,))
+        self.db.execute("DELETE FROM calls WHERE path = ?", (path,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def index_file(self, path, source):
+        module = parse(source)
+        if module is None:
+            return
+        calls = []
+        for decl in module.children:
+            if not isinstance(decl, (FnDeclAST, StructDeclAST, EnumDeclAST, VarDeclAST)):
+                continue
+            kind = type(decl).__name__[:-len("DeclAST")].lower()
+            cursor = self.db.execute(
+                "INSERT INTO symbols (path, kind, name, signature, line, col) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, kind, decl.children[0], signature(decl), decl.lineno, decl.col),
+            )
+            members = []
+            if isinstance(decl, StructDeclAST):
+                members = [(field.children[0], format_type(field.children[1]), field) for field in decl.children[1]]
+            elif isinstance(decl, EnumDeclAST):
+                members = [
+                    (variant.children[0], str(variant.children[1].children[0]) if isinstance(variant.children[1], LiteralAST) else None, variant)
+                    for variant in decl.children[1]
+                ]
+            elif isinstance(decl, FnDeclAST):
+                members = [(param.children[0], format_type(param.children[1]), param) for param in decl.children[1]]
+                calls += [
+                    (path, decl.children[0], node.children[0], node.lineno, node.col)
+                    for node in walk(decl.children[3])
+                    if isinstance(node, CallExprAST)
+                ]
+            self.db.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, name, detail, node.lineno, node.col) for name, detail, node in members],
+            )
+        self.db.executemany("INSERT INTO calls VALUES (?, ?, ?, ?, ?)", calls)
+
+    def lookup(self, name):
+        return self.db.execute(
+            "SELECT id, path, kind, name, signature, line, col FROM symbols WHERE name = ? ORDER BY path, line", (name,)
+        ).fetchall()
+
+    def prefix(self, prefix, limit=100):
+        return self.db.execute(
+            "SELECT id, path, kind, name, signature, line, col FROM symbols WHERE name >= ? AND name < ? ORDER BY name, path LIMIT ?",
+            (prefix, prefix + LAST_CHAR, limit),
+        ).fetchall()
+
+    def members(self, symbol):
+        return self.db.execute("SELECT name, detail, line, col FROM members WHERE symbol = ? ORDER BY rowid", (symbol,)).fetchall()
+
+    def callers(self, name):
+        return self.db.execute(
+            "SELECT path, caller, line, col FROM calls WHERE callee = ? ORDER BY path, line, col", (name,)
+        ).fetchall()
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="Index functions, structs and enums across .bug files")
+    arg_parser.add_argument("--db", default="bug.index", help="index file (sqlite)")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="index new and changed files")
+    update.add_argument("paths", nargs="+", help=".bug files or directories")
+    for command in ("find", "prefix", "callers"):
+        query = commands.add_parser(command)
+        query.add_argument("name")
+    return arg_parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    index = SymbolIndex(args.db)
+    if args.command == "update":
+        parsed, unchanged, removed = index.update(args.paths)
+        print(f"{parsed} indexed, {unchanged} unchanged, {removed} removed")
+    elif args.command == "callers":
+        for path, caller, line, col in index.callers(args.name):
+            print(f"{path}:{line}:{col}: {caller}")
+    else:
+        rows = index.lookup(args.name) if args.command == "find" else index.prefix(args.name)
+        for symbol, path, kind, name, text, line, col in rows:
+            print(f"{path}:{line}:{col}: {text}")
+            if args.command == "find":
+                separator = " = " if kind == "enum" else ": "
+                for member, detail, _, _ in index.members(symbol):
+                    print(f"    {member}" if detail is None else f"    {member}{separator}{detail}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+from bug_ast import *
+from bug_callgraph import CallGraph
+
+
+def hoistable_expr(stmt):
+    # The expression a statement evaluates exactly once, before its own effect.
+    if isinstance(stmt, (ExprStmtAST, ReturnStmtAST, IfStmtAST)):
+        return stmt.children[0]
+    if isinstance(stmt, VarDeclAST):
+        return stmt.children[2]
+    if isinstance(stmt, AssignStmtAST):
+        return stmt.children[1]
+    return None
+
+
+def nested_bodies(stmt):
+    if isinstance(stmt, IfStmtAST):
+        bodies = [stmt.children[1]]
+        if len(stmt.children) == 3:
+            if isinstance(stmt.children[2], IfStmtAST):
+                bodies += nested_bodies(stmt.children[2])
+            else:
+                bodies.append(stmt.children[2])
+        return bodies
+    if isinstance(stmt, (LoopStmtAST, BlockStmtAST)):
+        return [stmt.children[0]]
+    return []
+
+
+def collect_calls(node, found, chain=(), conditional=False):
+    # Records every call together with the calls enclosing it and whether it
+    # only runs on some paths (right of && / ||, inside a match arm).
+    if isinstance(node, list):
+        for item in node:
+            collect_calls(item, found, chain, conditional)
+    elif isinstance(node, CallExprAST):
+        found.append((node, chain, conditional))
+        collect_calls(node.children[1], found, chain + (node,), conditional)
+    elif isinstance(node, BinOpAST) and node.children[0] in ("&&", "||"):
+        collect_calls(node.children[1], found, chain, conditional)
+        collect_calls(node.children[2], found, chain, True)
+    elif isinstance(node, MatchExprAST):
+        collect_calls(node.children[0], found, chain, conditional)
+        collect_calls(node.children[1], found, chain, True)
+    elif isinstance(node, BaseAST):
+        for child in node.children:
+            collect_calls(child, found, chain, conditional)
+
+
+def hoistable_calls(expr):
+    # A call can be moved in front of its statement when it always runs and
+    # every other call in the expression either encloses it or is one of its
+    # arguments, so no observable evaluation order changes.
+    found = []
+    collect_calls(expr, found)
+    for call, chain, conditional in found:
+        if conditional:
+            continue
+        if all(
+            other is call or other in chain or call in other_chain
+            for other, other_chain, _ in found
+        ):
+            yield call
+
+
+def replace_node(node, old, new):
+    if isinstance(node, list):
+        for index, item in enumerate(node):
+            if item is old:
+                node[index] = new
+                return True
+            if replace_node(item, old, new):
+                return True
+    elif isinstance(node, BaseAST):
+        for child in node.children:
+            if child is old:
+                node.replace_child(old, new)
+                return True
+            if replace_node(child, old, new):
+                return True
+    return False
+
+
+def is_void(ret_type):
+    return ret_type is None or ret_type.children[0] == "void"
+
+
+class Inliner:
+    def __init__(self, max_size=40, max_once_size=200):
+        self.max_size = max_size
+        self.max_once_size = max_once_size
+        self.report = []
+        self.removed = []
+        self.counter = 0
+
+    def run(self, module):
+        graph = CallGraph(module)
+        self.functions = graph.functions
+        self.recursive = graph.recursive()
+        self.counts = {name: graph.call_count(name) for name in graph.functions}
+
+        for name in graph.bottom_up():
+            self.caller = name
+            fn = graph.functions[name]
+            self.caller_locals = {param.children[0] for param in fn.children[1]}
+            self.caller_locals |= {node.children[0] for node in walk(fn.children[3]) if isinstance(node, VarDeclAST)}
+            self.inline_body(graph.functions[name].children[3])
+
+        remaining = CallGraph(module)
+        inlined = {callee for _, callee, *_ in self.report}
+        for name in sorted(inlined):
+            if name != "main" and "export" not in self.functions[name].attrs and remaining.call_count(name) == 0:
+                module.remove_child(self.functions[name])
+                self.removed.append(name)
+
+        return self.report
+
+    def size(self, name):
+        return sum(1 for _ in walk(self.functions[name].children[3]))
+
+    def should_inline(self, call):
+        name = call.children[0]
+        if name not in self.functions or name == self.caller or name == "main":
+            return False
+        if name in self.recursive:
+            return False
+
+        params = self.functions[name].children[1]
+        if len(params) != len(call.children[1]):
+            return False
+        if any(param.children[1].children[0] == "array" for param in params):
+            return False
+
+        size = self.size(name)
+        if self.counts[name] == 1 and size <= self.max_once_size:
+            return True
+        return size <= self.max_size
+
+    def inline_body(self, body):
+        index = 0
+        while index < len(body):
+            stmt = body[index]
+            for nested in nested_bodies(stmt):
+                self.inline_body(nested)
+
+            expanded = self.inline_stmt(stmt)
+            if expanded is None:
+                index += 1
+            else:
+                body[index:index + 1] = expanded
+
+    def inline_stmt(self, stmt):
+        expr = hoistable_expr(stmt)
+        if expr is None:
+            return None
+
+        for call in hoistable_calls(expr):
+            if not self.should_inline(call):
+                continue
+            expanded = self.expand(stmt, call)
+            if expanded is not None:
+                return expanded
+
+        return None
+
+    def expand(self, stmt, call):
+        name = call.children[0]
+        fn = self.functions[name]
+        params = fn.children[1]
+        ret_type = fn.children[2]
+        discarded = isinstance(stmt, ExprStmtAST) and stmt.children[0] is call
+        if not discarded and is_void(ret_type):
+            return None
+
+        names = {param.children[0] for param in params}
+        names |= {node.children[0] for node in walk(fn.children[3]) if isinstance(node, VarDeclAST)}
+        # Globals the callee uses must not be shadowed by a caller local.
+        free = {
+            node.children[0]
+            for node in walk(fn.children[3])
+            if isinstance(node, (VarRefAST, AssignStmtAST)) and isinstance(node.children[0], str)
+        } - names
+        if free & self.caller_locals:
+            return None
+
+        self.counter += 1
+        prefix = f"_inl{self.counter}_"
+        size = self.size(name)
+        body = clone(fn.children[3])
+
+        for node in walk(body):
+            if isinstance(node, (VarRefAST, VarDeclAST, AssignStmtAST)) and node.children[0] in names:
+                node.children[0] = prefix + node.children[0]
+            elif isinstance(node, (GotoStmtAST, LabelStmtAST)):
+                # Labels of earlier expansions inside the callee; C labels
+                # are function-wide, so each copy needs its own.
+                node.children[0] = prefix + node.children[0]
+
+        result = None if discarded else prefix + "ret"
+        label = prefix + "end"
+
+        block = []
+        for param, arg in zip(params, call.children[1]):
+            block.append(VarDeclAST(prefix + param.children[0], clone(param.children[1]), arg))
+        block += self.lower_returns(body, result, label, tail=True)
+        if any(isinstance(node, GotoStmtAST) for node in walk(block)):
+            block.append(LabelStmtAST(label))
+
+        expanded = []
+        if result is not None:
+            expanded.append(VarDeclAST(result, clone(ret_type), None))
+        expanded.append(BlockStmtAST(block))
+        if not discarded:
+            replace_node(stmt, call, VarRefAST(result))
+            expanded.append(stmt)
+
+        self.report.append((self.caller, name, size, call.lineno, call.col))
+        return expanded
+
+    def lower_returns(self, body, result, label, tail):
+        # Turns every return into an assignment of the result temporary and,
+        # unless it already is the last thing executed, a jump to the end.
+        lowered = []
+        for index, stmt in enumerate(body):
+            last = tail and index == len(body) - 1
+            if isinstance(stmt, ReturnStmtAST):
+                value = stmt.children[0]
+                if result is not None:
+                    lowered.append(AssignStmtAST(result, value))
+                elif value is not None and not isinstance(value, (LiteralAST, VarRefAST)):
+                    lowered.append(ExprStmtAST(value))
+                if not last:
+                    lowered.append(GotoStmtAST(label))
+                break
+
+            self.lower_nested(stmt, result, label, last)
+            lowered.append(stmt)
+
+        return lowered
+
+    def lower_nested(self, stmt, result, label, tail):
+        if isinstance(stmt, IfStmtAST):
+            stmt.children[1] = self.lower_returns(stmt.children[1], result, label, tail)
+            if len(stmt.children) == 3:
+                if isinstance(stmt.children[2], IfStmtAST):
+                    self.lower_nested(stmt.children[2], result, label, tail)
+                else:
+                    stmt.children[2] = self.lower_returns(stmt.children[2], result, label, tail)
+        elif isinstance(stmt, (LoopStmtAST, BlockStmtAST)):
+            stmt.children[0] = self.lower_returns(stmt.children[0], result, label, False)
+
+    def format_report(self):
+        lines = [
+            f"inlined {callee} into {caller} at line {line} column {col} (size {size})"
+            for caller, callee, size, line, col in self.report
+        ]
+        lines += [f"removed {name} (all call sites inlined)" for name in self.removed]
+        return "\n".join(lines)
+
@@ -0,0 +1,90 @@
+from bug_ast import EnumDeclAST, StructDeclAST
+
+# Sizes and alignments on the LP64 targets we compile for.
+SCALARS = {
+    "char": (1, 1),
+    "bool": (1, 1),
+    "i32": (4, 4),
+    "f32": (4, 4),
+    "i64": (8, 8),
+    "f64": (8, 8),
+    "string": (8, 8),
+    "ptr": (8, 8),
+}
+ENUM = (4, 4)
+
+
+class StructLayout:
+    def __init__(self):
+        self.report = []
+
+    def run(self, module):
+        self.enums = {
+            decl.children[0] for decl in module.children if isinstance(decl, EnumDeclAST)
+        }
+        declared = {}
+        optimized = {}
+        for decl in module.children:
+            if not isinstance(decl, StructDeclAST):
+                continue
+
+            name, fields = decl.children
+            before = self.measure(fields, declared)
+            if "repr_c" not in decl.attrs and before is not None:
+                fields = sorted(fields, key=lambda field: -self.type_layout(field.children[1], optimized)[1])
+                decl.children[1] = fields
+            after = self.measure(fields, optimized)
+
+            if before is not None:
+                declared[name] = before[:2]
+            if after is not None:
+                optimized[name] = after[:2]
+            self.report.append((name, before, after, "repr_c" in decl.attrs))
+
+        return self.report
+
+    def type_layout(self, _type, structs):
+        kind = _type.children[0]
+        if kind == "array":
+            if len(_type.children) < 3:
+                return None
+            element = self.type_layout(_type.children[1], structs)
+            if element is None:
+                return None
+            return element[0] * _type.children[2], element[1]
+        if kind in SCALARS:
+            return SCALARS[kind]
+        if kind in self.enums:
+            return ENUM
+        return structs.get(kind)
+
+    def measure(self, fields, structs):
+        # (size, alignment, padding bytes) of a C struct with these fields
+        # in this order, or None when a field type has no known layout.
+        offset = 0
+        align = 1
+        padding = 0
+        for field in fields:
+            layout = self.type_layout(field.children[1], structs)
+            if layout is None:
+                return None
+            size, field_align = layout
+            gap = -offset % field_align
+            padding += gap
+            offset += gap + size
+            align = max(align, field_align)
+
+        tail = -offset % align
+        return offset + tail, align, padding + tail
+
+    def format_report(self):
+        lines = []
+        for name, before, after, kept in self.report:
+            if before is None:
+                lines.append(f"{name}: unknown layout, kept as declared")
+                continue
+            line = f"{name}: {before[0]} -> {after[0]} bytes, padding {before[2]} -> {after[2]}"
+            if kept:
+                line += " (@repr_c, kept as declared)"
+            lines.append(line)
+        return "\n".join(lines)
@@ -0,0 +1,104 @@
+import re
+
+from bug_ast import *
+from bug_parser import parse
+
+# What the body scanner has to see: comments and strings (to skip braces
+# inside them), braces, and the `fn` keyword.
+SCAN = re.compile(r"//[^\n]*|'[^']*'|\"[^\"]*\"|[{}]|\bfn\b")
+NOT_NEWLINE = re.compile(r"[^\n]")
+STATEMENT = re.compile(r"[^\n]{2}")
+
+
+class LazyBody:
+    # The unparsed text of a function body, source[start:stop] between the
+    # braces, parsed with the same line and column numbers it has in the
+    # file.
+    def __init__(self, source, start, stop, lineno):
+        self.source = source
+        self.start = start
+        self.stop = stop
+        self.lineno = lineno
+
+    def parse(self):
+        line_start = self.source.rfind("\n", 0, self.start) + 1
+        text = "fn body() {\n" + " " * (self.start - line_start) + self.source[self.start:self.stop] + "}"
+        return parse(text, self.lineno - 1).children[0].children[3]
+
+
+def body_ranges(source):
+    # (start, stop) of the text between the braces of every top-level
+    # function body.
+    depth = 0
+    in_fn = False
+    start = None
+    for match in SCAN.finditer(source):
+        token = match.group()
+        if token == "fn":
+            in_fn = in_fn or depth == 0
+        elif token == "{":
+            if depth == 0 and in_fn:
+                start = match.end()
+                in_fn = False
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0 and start is not None:
+                yield start, match.start()
+                start = None
+
+
+def parse_lazy(source):
+    # Parses every declaration but leaves function bodies as LazyBody until
+    # body() asks for them. The declarations are parsed from a copy of the
+    # source in which each body is blanked out to a single `0;` statement,
+    # keeping every other character where it was so line and column numbers
+    # match an eager parse. The placeholder's position identifies the body.
+    pieces = []
+    bodies = {}
+    last = 0
+    lineno = 1
+    for start, stop in body_ranges(source):
+        text = source[start:stop]
+        blank = NOT_NEWLINE.sub(" ", text)
+        slot = STATEMENT.search(blank)
+        if slot is None:
+            # Not a valid body; let the parser report it where it is.
+            continue
+        lineno += source.count("\n", last, start)
+        position = start + slot.start()
+        line_start = source.rfind("\n", 0, position) + 1
+        key = (lineno + blank.count("\n", 0, slot.start()), position - line_start + 1)
+        bodies[key] = LazyBody(source, start, stop, lineno)
+        pieces.append(source[last:start])
+        pieces.append(blank[:slot.start()] + "0;" + blank[slot.end():])
+        lineno += text.count("\n")
+        last = stop
+    pieces.append(source[last:])
+
+    module = parse("".join(pieces))
+    if module is None:
+        return None
+    for decl in module.children:
+        if isinstance(decl, FnDeclAST) and len(decl.children[3]) == 1:
+            stub = decl.children[3][0]
+            if not isinstance(stub, BaseAST):
+                # A body too short to blank, parsed eagerly (e.g. `{;}`).
+                continue
+            lazy = bodies.get((stub.lineno, stub.col))
+            if lazy is not None:
+                decl.children[3] = lazy
+    return module
+
+
+def body(fn):
+    if isinstance(fn.children[3], LazyBody):
+        fn.children[3] = fn.children[3].parse()
+    return fn.children[3]
+
+
+def force(module):
+    for decl in module.children:
+        if isinstance(decl, FnDeclAST):
+            body(decl)
+    return module
@@ -28,7 +28,7 @@ tokens = (
     'PLUS', 'MINUS', 'STAR', 'SLASH', 'PERCENT', 'NOT', 'AND', 'OR',
     'LT', 'GT', 'LE', 'GE', 'EQEQ', 'NEQ',
     'DOT', 'LBRACKET', 'RBRACKET', 'ARROW', 'FAT_ARROW',
-    'SEMI', 'INT', 'FLOAT', 'STRING',
+    'SEMI', 'INT', 'FLOAT', 'STRING', 'AT',
 ) + tuple(set(reserved.values()))
 
 # Literals
@@ -40,16 +40,17 @@ def t_IDENT(t):
     t.type = reserved.get(t.value,'IDENT')    # Check for reserved words
     return t
 
-def t_INT(t):
-    r'[0-9]+'
-    t.value = int(t.value)
-    return t
-
+# FLOAT must come before INT: PLY tries function rules in definition order.
 def t_FLOAT(t):
     r'[0-9]+\.[0-9]+'
     t.value = float(t.value)
     return t
 
+def t_INT(t):
+    r'[0-9]+'
+    t.value = int(t.value)
+    return t
+
 def t_STRING(t):
     r'\'[^\']*\'|\"[^\"]*\"'
     t.value = str(t.value[1:-1])
@@ -85,6 +86,7 @@ t_COMMA = r','
 t_EQ = r'='
 t_LBRACE = r'\{'
 t_RBRACE = r'\}'
+t_AT = r'@'
 
 
 def t_NEWLINE(t):
@@ -98,7 +100,7 @@ t_ignore ='\t\r'
 def t_WHITESPACE(t):
     # skip whitespace
     r'\s+'
-    pass
+    t.lexer.lineno += t.value.count('\n')
 
 def t_COMMENT(t):
     r'\//.*'
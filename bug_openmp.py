@@ -0,0 +1,227 @@
+from bug_ast import *
+from bug_inline import nested_bodies
+from bug_types import TypeEnv
+
+# Reductions are only formed over integers: reassociating float sums would
+# change the results.
+INTEGERS = ("i32", "i64", "char")
+REDUCTIONS = {"+": "+", "-": "+", "*": "*"}
+
+
+def is_increment(stmt, counter):
+    if not isinstance(stmt, AssignStmtAST) or stmt.children[0] != counter:
+        return False
+    value = stmt.children[1]
+    if not isinstance(value, BinOpAST) or value.children[0] != "+":
+        return False
+    operands = value.children[1:]
+    return any(
+        isinstance(left, VarRefAST) and left.children[0] == counter
+        and isinstance(right, LiteralAST) and right.children[0] == 1 and right.children[1] == int
+        for left, right in (operands, operands[::-1])
+    )
+
+
+def write_root(target):
+    # (name, index) of what an assignment target writes: index is None for
+    # a whole variable or struct field, the index expression for an array
+    # element. None when the target is not rooted in a plain variable.
+    while isinstance(target, FieldAccessExprAST):
+        target = target.children[0]
+    if isinstance(target, ArrayAccessExprAST):
+        base, index = target.children
+        if isinstance(base, VarRefAST):
+            return base.children[0], index
+        return None
+    if isinstance(target, VarRefAST):
+        return target.children[0], None
+    return None
+
+
+class ParallelLoops:
+    def __init__(self):
+        self.report = []
+
+    def run(self, module):
+        self.env = TypeEnv(module)
+        self.pure = {
+            decl.children[0]
+            for decl in module.children
+            if isinstance(decl, FnDeclAST) and "pure" in decl.attrs
+        }
+        for decl in module.children:
+            if isinstance(decl, FnDeclAST):
+                self.env.enter(decl)
+                self.fn = decl.children[0]
+                self.params = {param.children[0] for param in decl.children[1]}
+                self.convert(decl.children[3], nested=False)
+        return self.report
+
+    def convert(self, body, nested):
+        # Only loops outside of any other loop fork threads; a parallel
+        # region per outer iteration costs more than it saves, so nested
+        # loops are only vectorized.
+        for index, stmt in enumerate(body):
+            if isinstance(stmt, LoopStmtAST):
+                loop = self.analyze(stmt)
+                if loop is not None:
+                    counter, op, limit, inner, reductions = loop
+                    vector = self.unit_stride(inner, counter) and not any(
+                        isinstance(node, LoopStmtAST) for node in walk(inner)
+                    )
+                    if nested:
+                        mode = "simd" if vector else None
+                    else:
+                        mode = "parallel for simd" if vector else "parallel for"
+                    if mode is not None:
+                        parallel = ParallelLoopStmtAST(
+                            counter, clone(self.env.lookup(counter)), op, limit, inner, mode, reductions
+                        )
+                        parallel.lineno, parallel.col = stmt.lineno, stmt.col
+                        body[index] = parallel
+                        self.report.append((self.fn, stmt.lineno, mode, reductions))
+                        self.convert(inner, nested=True)
+                        continue
+                self.convert(stmt.children[0], nested=True)
+                continue
+            for nested_body in nested_bodies(stmt):
+                self.convert(nested_body, nested)
+
+    @staticmethod
+    def unit_stride(body, counter):
+        # Forcing simd on strided or computed indexes makes the compiler
+        # use gathers, which is slower than the scalar loop.
+        for node in walk(body):
+            if isinstance(node, ArrayAccessExprAST):
+                index = node.children[1]
+                if isinstance(index, VarRefAST) and index.children[0] == counter:
+                    continue
+                if any(isinstance(ref, VarRefAST) and ref.children[0] == counter for ref in walk(index)):
+                    return False
+        return True
+
+    def is_array(self, name):
+        _type = self.env.lookup(name)
+        return _type is not None and _type.children[0] in ("array", "ptr")
+
+    def may_alias(self, name):
+        # Parameters, globals and unsized arrays can point at the same
+        # storage under different names; sized local arrays cannot.
+        _type = self.env.lookup(name)
+        if name in self.params or not self.env.is_local(name):
+            return True
+        return _type.children[0] == "ptr" or len(_type.children) < 3
+
+    def reduction_op(self, stmt, name):
+        value = stmt.children[1]
+        if not isinstance(value, BinOpAST) or value.children[0] not in REDUCTIONS:
+            return None
+        op, left, right = value.children
+        if isinstance(left, VarRefAST) and left.children[0] == name:
+            rest = right
+        elif op != "-" and isinstance(right, VarRefAST) and right.children[0] == name:
+            rest = left
+        else:
+            return None
+        if any(isinstance(node, VarRefAST) and node.children[0] == name for node in walk(rest)):
+            return None
+        return REDUCTIONS[op]
+
+    def analyze(self, loop):
+        # A loop `while counter < limit { ...; counter = counter + 1; }`
+        # whose iterations are independent: apart from integer reductions
+        # it only writes variables declared in the body and array elements
+        # indexed by the counter, and nothing it reads at another index may
+        # be one of those arrays.
+        body, cond = loop.children
+        if not isinstance(cond, BinOpAST) or cond.children[0] not in ("<", "<="):
+            return None
+        op, counter_ref, limit = cond.children
+        if not isinstance(counter_ref, VarRefAST):
+            return None
+        counter = counter_ref.children[0]
+        counter_type = self.env.lookup(counter)
+        if counter_type is None or counter_type.children[0] not in INTEGERS:
+            return None
+        if not body or not is_increment(body[-1], counter):
+            return None
+
+        inner = body[:-1]
+        nodes = list(walk(inner))
+        if any(isinstance(node, (ReturnStmtAST, GotoStmtAST, LabelStmtAST)) for node in nodes):
+            return None
+        if any(isinstance(node, CallExprAST) and node.children[0] not in self.pure for node in nodes):
+            return None
+        if any(not isinstance(node, (LiteralAST, VarRefAST, BinOpAST, UnOpAST)) for node in walk(limit)):
+            return None
+        declared = {node.children[0] for node in nodes if isinstance(node, VarDeclAST)}
+        if counter in declared:
+            return None
+
+        updates = {}
+        written_arrays = set()
+        for node in nodes:
+            if not isinstance(node, AssignStmtAST):
+                continue
+            target = node.children[0]
+            if isinstance(target, str):
+                if target == counter:
+                    return None
+                if target not in declared:
+                    updates.setdefault(target, []).append(node)
+                continue
+            root = write_root(target)
+            if root is None:
+                return None
+            name, index = root
+            if name in declared:
+                continue
+            if index is None or not (isinstance(index, VarRefAST) and index.children[0] == counter):
+                return None
+            written_arrays.add(name)
+
+        reductions = []
+        for name, stmts in updates.items():
+            _type = self.env.lookup(name)
+            if _type is None or _type.children[0] not in INTEGERS:
+                return None
+            ops = {self.reduction_op(stmt, name) for stmt in stmts}
+            if len(ops) != 1 or None in ops:
+                return None
+            uses = sum(1 for node in nodes if isinstance(node, VarRefAST) and node.children[0] == name)
+            if uses != len(stmts):
+                return None
+            reductions.append((ops.pop(), name))
+
+        limit_names = {node.children[0] for node in walk(limit) if isinstance(node, VarRefAST)}
+        if limit_names & (set(updates) | written_arrays):
+            return None
+
+        # Arrays read at any index other than the counter, including whole
+        # arrays passed to @pure calls.
+        elsewhere = set()
+        for node in nodes:
+            if isinstance(node, ArrayAccessExprAST):
+                base, index = node.children
+                if not isinstance(base, VarRefAST):
+                    return None
+                if not (isinstance(index, VarRefAST) and index.children[0] == counter):
+                    elsewhere.add(base.children[0])
+            elif isinstance(node, VarRefAST) and self.is_array(node.children[0]):
+                parent = node.parent
+                if not isinstance(parent, ArrayAccessExprAST) or parent.children[0] is not node:
+                    elsewhere.add(node.children[0])
+        elsewhere -= declared
+        if written_arrays & elsewhere:
+            return None
+        if any(self.may_alias(name) for name in written_arrays) and any(self.may_alias(name) for name in elsewhere):
+            return None
+
+        return counter, op, limit, inner, sorted(reductions, key=lambda reduction: reduction[1])
+
+    def format_report(self):
+        lines = []
+        for fn, line, mode, reductions in self.report:
+            clauses = "".join(f" reduction({op}:{name})" for op, name in reductions)
+            lines.append(f"{fn}: loop at line {line}: omp {mode}{clauses}")
+        return "\n".join(lines)
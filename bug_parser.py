@@ -1,6 +1,17 @@
 import ply.yacc as yacc
 from bug_ast import *
-from bug_lexer import find_column, tokens
+from bug_lexer import find_column, lexer, tokens
+
+
+def locate(p, index=1):
+    # Records where p[0] starts: at the token p[index], or wherever the node
+    # p[index] was found to start.
+    if isinstance(p[index], BaseAST):
+        p[0].lineno = p[index].lineno
+        p[0].col = p[index].col
+    else:
+        p[0].lineno = p.lineno(index)
+        p[0].col = find_column(p.lexer.lexdata, p.slice[index])
 
 
 # Parsing rules
@@ -15,7 +26,9 @@ def p_decls(p):
     if len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = p[1] + [p[2]]
+        # Append in place; copying the list on every reduction is quadratic.
+        p[0] = p[1]
+        p[0].append(p[2])
 
 
 def p_decl(p):
@@ -28,6 +41,23 @@ def p_decl(p):
         p[0] = p[1]
 
 
+def p_decl_attrs(p):
+    """decl : attrs fn_decl
+    | attrs struct_decl
+    | attrs enum_decl"""
+    p[2].attrs.update(p[1])
+    p[0] = p[2]
+
+
+def p_attrs(p):
+    """attrs : AT IDENT
+    | attrs AT IDENT"""
+    if len(p) == 3:
+        p[0] = [p[2]]
+    else:
+        p[0] = p[1] + [p[3]]
+
+
 def p_fn_decl(p):
     """fn_decl : FN IDENT LPAREN params RPAREN ARROW type LBRACE body RBRACE
     | FN IDENT LPAREN RPAREN ARROW type LBRACE body RBRACE
@@ -64,21 +94,25 @@ def p_fn_decl(p):
         }
 
     p[0] = FnDeclAST(**con)
+    locate(p)
 
 
 def p_var_decl(p):
     "var_decl : LET IDENT COLON type EQ expr SEMI"
     p[0] = VarDeclAST(p[2], p[4], p[6])
+    locate(p)
 
 
 def p_struct_decl(p):
     "struct_decl : STRUCT IDENT LBRACE fields RBRACE"
     p[0] = StructDeclAST(p[2], p[4])
+    locate(p)
 
 
 def p_enum_decl(p):
     "enum_decl : ENUM IDENT LBRACE variants RBRACE"
     p[0] = EnumDeclAST(p[2], p[4])
+    locate(p)
 
 
 def p_params(p):
@@ -93,6 +127,7 @@ def p_params(p):
 def p_param(p):
     "param : IDENT COLON type"
     p[0] = ParamAST(p[1], p[3])
+    locate(p)
 
 
 def p_fields(p):
@@ -107,6 +142,7 @@ def p_fields(p):
 def p_field(p):
     "field : IDENT COLON type"
     p[0] = FieldAST(p[1], p[3])
+    locate(p)
 
 
 def p_variants(p):
@@ -121,6 +157,7 @@ def p_variants(p):
 def p_variant(p):
     "variant : IDENT EQ expr"
     p[0] = VariantAST(p[1], p[3])
+    locate(p)
 
 
 def p_type(p):
@@ -162,7 +199,8 @@ def p_body(p):
     if len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = p[1] + [p[2]]
+        p[0] = p[1]
+        p[0].append(p[2])
 
 
 def p_stmt(p):
@@ -179,11 +217,13 @@ def p_stmt(p):
 def p_return_stmt(p):
     "return_stmt : RETURN expr SEMI"
     p[0] = ReturnStmtAST(p[2])
+    locate(p)
 
 
 def p_expr_stmt(p):
     "expr_stmt : expr SEMI"
     p[0] = ExprStmtAST(p[1])
+    locate(p)
 
 
 def p_if_stmt(p):
@@ -206,16 +246,21 @@ def p_if_stmt(p):
         }
 
     p[0] = IfStmtAST(**con)
+    locate(p)
 
 
 def p_loop_stmt(p):
     "loop_stmt : LOOP LBRACE body RBRACE WHILE expr SEMI"
     p[0] = LoopStmtAST(p[3], p[6])
+    locate(p)
 
 
 def p_assign_stmt(p):
-    "assign_stmt : IDENT EQ expr SEMI"
+    """assign_stmt : IDENT EQ expr SEMI
+    | array_access_expr EQ expr SEMI
+    | field_access_expr EQ expr SEMI"""
     p[0] = AssignStmtAST(p[1], p[3])
+    locate(p)
 
 
 def p_patterns(p):
@@ -243,6 +288,7 @@ def p_pattern_guard(p):
 def p_ident(p):
     "ident : IDENT"
     p[0] = VarRefAST(p[1])
+    locate(p)
 
 
 def p_args(p):
@@ -268,6 +314,7 @@ precedence = (
     ("left", "STAR", "SLASH", "PERCENT"),
     ("right", "UNOT"),
     ("right", "UMINUS"),
+    ("left", "DOT", "LBRACKET"),
 )
 
 
@@ -296,6 +343,7 @@ def p_unary_expr(p):
     | MINUS expr %prec UMINUS
     | PLUS expr %prec UMINUS"""
     p[0] = UnOpAST(p[1], p[2])
+    locate(p)
 
 
 def p_binary_expr(p):
@@ -313,6 +361,7 @@ def p_binary_expr(p):
     | expr AND expr
     | expr OR expr"""
     p[0] = BinOpAST(p[2], p[1], p[3])
+    locate(p)
 
 
 def p_call_expr(p):
@@ -324,21 +373,25 @@ def p_call_expr(p):
         con = {"name": p[1], "args": []}
 
     p[0] = CallExprAST(**con)
+    locate(p)
 
 
 def p_field_access_expr(p):
     "field_access_expr : expr DOT IDENT"
     p[0] = FieldAccessExprAST(p[1], p[3])
+    locate(p)
 
 
 def p_array_access_expr(p):
     "array_access_expr : expr LBRACKET expr RBRACKET"
     p[0] = ArrayAccessExprAST(p[1], p[3])
+    locate(p)
 
 
 def p_match_expr(p):
     "match_expr : MATCH expr LBRACE patterns RBRACE"
     p[0] = MatchExprAST(p[2], p[4])
+    locate(p)
 
 
 def p_list(p):
@@ -348,6 +401,7 @@ def p_list(p):
         p[0] = ListAST(p[2])
     else:
         p[0] = ListAST([])
+    locate(p)
 
 
 def p_elements(p):
@@ -362,6 +416,7 @@ def p_elements(p):
 def p_new_struct(p):
     """new_struct : NEW IDENT LBRACE fields_value RBRACE"""
     p[0] = NewStructAST(p[2], p[4])
+    locate(p)
 
 
 def p_fields_value(p):
@@ -376,6 +431,7 @@ def p_fields_value(p):
 def p_field_value(p):
     "field_value : IDENT COLON expr"
     p[0] = FieldValueAST(p[1], p[3])
+    locate(p)
 
 
 def p_literal(p):
@@ -386,6 +442,7 @@ def p_literal(p):
     """
     _type = (p[1] in ("true", "false") and bool) or type(p[1])
     p[0] = LiteralAST(value=p[1], _type=_type)
+    locate(p)
 
 
 # Error handling
@@ -401,6 +458,12 @@ def p_error(p):
 # Build the parser
 parser = yacc.yacc()
 
+
+def parse(data, lineno=1):
+    # The lexer is shared between parses; restart its line count.
+    lexer.lineno = lineno
+    return parser.parse(data, lexer=lexer)
+
 # Test the parser
 # if __name__ == "__main__":
 #     with open("example.bug", "r") as f:
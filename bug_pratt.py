@@ -0,0 +1,386 @@
+import re
+
+from bug_ast import *
+from bug_lexer import reserved
+
+# The rules of bug_lexer in the order PLY tries them: function rules as
+# defined, then string rules longest first.
+TOKEN = re.compile(
+    r"(?P<IDENT>[a-zA-Z_][a-zA-Z_0-9]*)"
+    r"|(?P<FLOAT>[0-9]+\.[0-9]+)"
+    r"|(?P<INT>[0-9]+)"
+    r"|(?P<STRING>'[^']*'|\"[^\"]*\")"
+    r"|(?P<SPACE>\s+)"
+    r"|(?P<COMMENT>//.*)"
+    r"|(?P<OP>\|\||&&|<=|>=|==|!=|->|=>|[-+*/%!<>.\[\](){}:;,=@])"
+)
+
+OPERATORS = {
+    "||": "OR", "&&": "AND", "<=": "LE", ">=": "GE", "==": "EQEQ", "!=": "NEQ",
+    "->": "ARROW", "=>": "FAT_ARROW", "+": "PLUS", "-": "MINUS", "*": "STAR",
+    "/": "SLASH", "%": "PERCENT", "!": "NOT", "<": "LT", ">": "GT", ".": "DOT",
+    "[": "LBRACKET", "]": "RBRACKET", "(": "LPAREN", ")": "RPAREN", "{": "LBRACE",
+    "}": "RBRACE", ":": "COLON", ";": "SEMI", ",": "COMMA", "=": "EQ", "@": "AT",
+}
+
+# bug_parser's precedence table; postfix `.` and `[` bind tighter than all
+# of these and unary operators sit between them.
+BINARY = {
+    "OR": 1,
+    "AND": 2,
+    "EQEQ": 3, "NEQ": 3,
+    "LT": 4, "GT": 4, "LE": 4, "GE": 4,
+    "PLUS": 5, "MINUS": 5,
+    "STAR": 6, "SLASH": 6, "PERCENT": 6,
+}
+UNARY = 7
+
+PRIMITIVE_TYPES = ("I32", "I64", "F32", "F64", "BOOL", "CHAR", "STRING", "IDENT")
+EOF = ("$end", None, None, None)
+
+
+def tokenize(data, lineno=1):
+    # (type, value, lineno, lexpos) tuples, the same tokens bug_lexer makes.
+    tokens = []
+    append = tokens.append
+    pos = 0
+    for found in TOKEN.finditer(data):
+        start = found.start()
+        while pos < start:
+            # finditer skips what no rule matches; report it like PLY does.
+            line_start = data.rfind("\n", 0, pos) + 1
+            print(f"Illegal character '{data[pos]}' at line {lineno} position {pos - line_start + 1}")
+            pos += 1
+        pos = found.end()
+        kind = found.lastgroup
+        if kind == "SPACE":
+            lineno += found.group().count("\n")
+        elif kind == "OP":
+            text = found.group()
+            append((OPERATORS[text], text, lineno, start))
+        elif kind == "IDENT":
+            text = found.group()
+            append((reserved.get(text, "IDENT"), text, lineno, start))
+        elif kind == "INT":
+            append(("INT", int(found.group()), lineno, start))
+        elif kind == "FLOAT":
+            append(("FLOAT", float(found.group()), lineno, start))
+        elif kind == "STRING":
+            append(("STRING", found.group()[1:-1], lineno, start))
+    for pos in range(pos, len(data)):
+        line_start = data.rfind("\n", 0, pos) + 1
+        print(f"Illegal character '{data[pos]}' at line {lineno} position {pos - line_start + 1}")
+    return tokens
+
+
+class ParseError(Exception):
+    pass
+
+
+class Parser:
+    def __init__(self, data, lineno=1):
+        self.data = data
+        self.tokens = tokenize(data, lineno)
+        self.tokens.append(EOF)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0]
+
+    def advance(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, kind):
+        token = self.tokens[self.pos]
+        if token[0] != kind:
+            raise ParseError(token)
+        self.pos += 1
+        return token
+
+    def locate(self, node, token):
+        node.lineno = token[2]
+        node.col = token[3] - self.data.rfind("\n", 0, token[3])
+        return node
+
+    @staticmethod
+    def locate_at(node, other):
+        node.lineno = other.lineno
+        node.col = other.col
+        return node
+
+    def parse(self):
+        try:
+            if self.peek() == "$end":
+                raise ParseError(EOF)
+            decls = []
+            while self.peek() != "$end":
+                decls.append(self.decl())
+            return ModuleAST(decls)
+        except ParseError as error:
+            token = error.args[0]
+            if token is EOF:
+                print("Syntax error at EOF")
+            else:
+                line_start = self.data.rfind("\n", 0, token[3]) + 1
+                print(f"Syntax error at token {token[0]} ({token[1]}) at line {token[2]} column {token[3] - line_start + 1}")
+            return None
+
+    # Declarations
+
+    def decl(self):
+        kind = self.peek()
+        if kind == "SEMI":
+            self.advance()
+            return None
+        if kind == "LET":
+            return self.var_decl()
+        attrs = []
+        while self.peek() == "AT":
+            self.advance()
+            attrs.append(self.expect("IDENT")[1])
+        kind = self.peek()
+        if kind == "FN":
+            decl = self.fn_decl()
+        elif kind == "STRUCT":
+            decl = self.struct_decl()
+        elif kind == "ENUM":
+            decl = self.enum_decl()
+        else:
+            raise ParseError(self.tokens[self.pos])
+        decl.attrs.update(attrs)
+        return decl
+
+    def fn_decl(self):
+        start = self.expect("FN")
+        name = self.expect("IDENT")[1]
+        self.expect("LPAREN")
+        params = []
+        if self.peek() != "RPAREN":
+            params = self.separated(self.param)
+        self.expect("RPAREN")
+        ret_type = None
+        if self.peek() == "ARROW":
+            self.advance()
+            ret_type = self.type()
+        self.expect("LBRACE")
+        body = self.body()
+        self.expect("RBRACE")
+        return self.locate(FnDeclAST(name, params, ret_type, body), start)
+
+    def var_decl(self):
+        start = self.expect("LET")
+        name = self.expect("IDENT")[1]
+        self.expect("COLON")
+        _type = self.type()
+        self.expect("EQ")
+        value = self.expr()
+        self.expect("SEMI")
+        return self.locate(VarDeclAST(name, _type, value), start)
+
+    def struct_decl(self):
+        start = self.expect("STRUCT")
+        name = self.expect("IDENT")[1]
+        self.expect("LBRACE")
+        fields = self.separated(self.field)
+        self.expect("RBRACE")
+        return self.locate(StructDeclAST(name, fields), start)
+
+    def enum_decl(self):
+        start = self.expect("ENUM")
+        name = self.expect("IDENT")[1]
+        self.expect("LBRACE")
+        variants = self.separated(self.variant)
+        self.expect("RBRACE")
+        return self.locate(EnumDeclAST(name, variants), start)
+
+    def separated(self, item):
+        items = [item()]
+        while self.peek() == "COMMA":
+            self.advance()
+            items.append(item())
+        return items
+
+    def param(self):
+        start = self.expect("IDENT")
+        self.expect("COLON")
+        return self.locate(ParamAST(start[1], self.type()), start)
+
+    def field(self):
+        start = self.expect("IDENT")
+        self.expect("COLON")
+        return self.locate(FieldAST(start[1], self.type()), start)
+
+    def variant(self):
+        start = self.expect("IDENT")
+        self.expect("EQ")
+        return self.locate(VariantAST(start[1], self.expr()), start)
+
+    def type(self):
+        token = self.advance()
+        kind = token[0]
+        if kind in PRIMITIVE_TYPES:
+            return TypeAST(token[1])
+        if kind == "LBRACKET":
+            element = self.type()
+            if self.peek() == "SEMI":
+                self.advance()
+                size = self.expect("INT")[1]
+                self.expect("RBRACKET")
+                return TypeAST("array", element, size)
+            self.expect("RBRACKET")
+            return TypeAST("array", element)
+        if kind == "STAR":
+            return TypeAST("ptr", self.type())
+        raise ParseError(token)
+
+    # Statements
+
+    def body(self):
+        stmts = [self.stmt()]
+        while self.peek() != "RBRACE":
+            stmts.append(self.stmt())
+        return stmts
+
+    def stmt(self):
+        kind = self.peek()
+        if kind == "SEMI":
+            self.advance()
+            return ";"
+        if kind == "IF":
+            return self.if_stmt()
+        if kind == "LOOP":
+            start = self.advance()
+            self.expect("LBRACE")
+            body = self.body()
+            self.expect("RBRACE")
+            self.expect("WHILE")
+            cond = self.expr()
+            self.expect("SEMI")
+            return self.locate(LoopStmtAST(body, cond), start)
+        if kind == "LET":
+            return self.var_decl()
+        if kind == "RETURN":
+            start = self.advance()
+            value = self.expr()
+            self.expect("SEMI")
+            return self.locate(ReturnStmtAST(value), start)
+
+        first = self.pos
+        expr = self.expr()
+        if self.peek() == "EQ":
+            # Only `name = ...` and unparenthesized element / field targets.
+            if isinstance(expr, VarRefAST) and self.pos == first + 1:
+                target = expr.children[0]
+            elif isinstance(expr, (ArrayAccessExprAST, FieldAccessExprAST)) and self.tokens[self.pos - 1][0] != "RPAREN":
+                target = expr
+            else:
+                raise ParseError(self.tokens[self.pos])
+            self.advance()
+            value = self.expr()
+            self.expect("SEMI")
+            return self.locate_at(AssignStmtAST(target, value), expr)
+        self.expect("SEMI")
+        return self.locate_at(ExprStmtAST(expr), expr)
+
+    def if_stmt(self):
+        start = self.expect("IF")
+        cond = self.expr()
+        self.expect("LBRACE")
+        then_body = self.body()
+        self.expect("RBRACE")
+        if self.peek() != "ELSE":
+            return self.locate(IfStmtAST(cond, then_body), start)
+        self.advance()
+        if self.peek() == "IF":
+            return self.locate(IfStmtAST(cond, then_body, elseif_body=self.if_stmt()), start)
+        self.expect("LBRACE")
+        else_body = self.body()
+        self.expect("RBRACE")
+        return self.locate(IfStmtAST(cond, then_body, else_body=else_body), start)
+
+    # Expressions
+
+    def expr(self, min_precedence=0):
+        left = self.prefix()
+        tokens = self.tokens
+        while True:
+            kind = tokens[self.pos][0]
+            if kind == "DOT":
+                self.pos += 1
+                field = self.expect("IDENT")[1]
+                left = self.locate_at(FieldAccessExprAST(left, field), left)
+            elif kind == "LBRACKET":
+                self.pos += 1
+                index = self.expr()
+                self.expect("RBRACKET")
+                left = self.locate_at(ArrayAccessExprAST(left, index), left)
+            else:
+                precedence = BINARY.get(kind)
+                if precedence is None or precedence < min_precedence:
+                    return left
+                op = tokens[self.pos][1]
+                self.pos += 1
+                right = self.expr(precedence + 1)
+                left = self.locate_at(BinOpAST(op, left, right), left)
+
+    def prefix(self):
+        token = self.advance()
+        kind = token[0]
+        if kind in ("INT", "FLOAT", "BOOLEAN", "STRING"):
+            value = token[1]
+            _type = (value in ("true", "false") and bool) or type(value)
+            return self.locate(LiteralAST(value=value, _type=_type), token)
+        if kind == "IDENT":
+            if self.peek() != "LPAREN":
+                return self.locate(VarRefAST(token[1]), token)
+            self.advance()
+            args = []
+            if self.peek() != "RPAREN":
+                args = self.separated(self.expr)
+            self.expect("RPAREN")
+            return self.locate(CallExprAST(name=token[1], args=args), token)
+        if kind in ("NOT", "MINUS", "PLUS"):
+            return self.locate(UnOpAST(token[1], self.expr(UNARY)), token)
+        if kind == "LPAREN":
+            expr = self.expr()
+            self.expect("RPAREN")
+            return expr
+        if kind == "MATCH":
+            subject = self.expr()
+            self.expect("LBRACE")
+            patterns = self.separated(self.pattern)
+            self.expect("RBRACE")
+            return self.locate(MatchExprAST(subject, patterns), token)
+        if kind == "LBRACKET":
+            elements = []
+            if self.peek() != "RBRACKET":
+                elements = self.separated(self.expr)
+            self.expect("RBRACKET")
+            return self.locate(ListAST(elements), token)
+        if kind == "NEW":
+            name = self.expect("IDENT")[1]
+            self.expect("LBRACE")
+            fields = self.separated(self.field_value)
+            self.expect("RBRACE")
+            return self.locate(NewStructAST(name, fields), token)
+        raise ParseError(token)
+
+    def pattern(self):
+        if self.peek() == "STAR":
+            self.advance()
+            pattern = WildcardPatternAST()
+        else:
+            pattern = ExprPatternAST(self.expr())
+        self.expect("FAT_ARROW")
+        return PatternCaseAST(pattern, self.expr())
+
+    def field_value(self):
+        start = self.expect("IDENT")
+        self.expect("COLON")
+        return self.locate(FieldValueAST(start[1], self.expr()), start)
+
+
+def parse(data, lineno=1):
+    return Parser(data, lineno).parse()
@@ -0,0 +1,174 @@
+from bug_ast import *
+
+COUNTERS = "bug_probe_counters"
+PROBE_NAMES = "bug_probe_names"
+
+
+def probes(fn):
+    # Every counted point of a function with a key that only depends on the
+    # function name and the position of the node, so an instrumented build
+    # and a later --profile-use build of the same source agree on them.
+    name = fn.children[0]
+    yield f"{name}:entry", fn
+    seen = {LoopStmtAST: 0, IfStmtAST: 0, MatchExprAST: 0}
+    prefixes = {LoopStmtAST: "loop", IfStmtAST: "if", MatchExprAST: "match"}
+    for node in walk(fn.children[3]):
+        kind = type(node)
+        if kind in seen:
+            yield f"{name}:{prefixes[kind]}{seen[kind]}", node
+            seen[kind] += 1
+
+
+def count(index):
+    return CallExprAST("BUG_COUNT", [LiteralAST(index, int)])
+
+
+def load_profile(paths):
+    # `name count` lines as written by the runtime; several runs add up.
+    profile = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                key, value = line.rsplit(None, 1)
+                profile[key] = profile.get(key, 0) + int(value)
+    return profile
+
+
+class Instrumenter:
+    def __init__(self, output="bug.profile"):
+        self.output = output
+        self.names = []
+
+    def counter(self, key):
+        self.names.append(key)
+        return len(self.names) - 1
+
+    def run(self, module):
+        functions = [decl for decl in module.children if isinstance(decl, FnDeclAST)]
+        for fn in functions:
+            for key, node in list(probes(fn)):
+                if isinstance(node, FnDeclAST):
+                    node.children[3].insert(0, ExprStmtAST(count(self.counter(key))))
+                elif isinstance(node, LoopStmtAST):
+                    # Counted at the end of the body, i.e. once per back-edge.
+                    node.children[0].append(ExprStmtAST(count(self.counter(key))))
+                elif isinstance(node, IfStmtAST):
+                    taken = self.counter(key + ":then")
+                    self.counter(key + ":else")
+                    cond = node.children[0]
+                    node.replace_child(cond, CallExprAST("BUG_BRANCH", [LiteralAST(taken, int), cond]))
+                else:
+                    for arm, case in enumerate(node.children[1]):
+                        expr = case.children[1]
+                        case.replace_child(expr, CallExprAST("BUG_ARM", [LiteralAST(self.counter(f"{key}:{arm}"), int), expr]))
+
+        size = max(len(self.names), 1)
+        names = ConstTableDeclAST(
+            PROBE_NAMES,
+            TypeAST("array", TypeAST("string"), size),
+            ListAST([LiteralAST(name, str) for name in self.names] or [LiteralAST("", str)]),
+        )
+        counters = VarDeclAST(COUNTERS, TypeAST("array", TypeAST("i64"), size), None)
+        module.children[:0] = [names, counters]
+        names.parent = counters.parent = module
+
+        for fn in functions:
+            if fn.children[0] == "main":
+                register = CallExprAST(
+                    "bug_profile_register",
+                    [
+                        VarRefAST(PROBE_NAMES),
+                        VarRefAST(COUNTERS),
+                        LiteralAST(len(self.names), int),
+                        LiteralAST(self.output.replace("\\", "\\\\").replace('"', '\\"'), str),
+                    ],
+                )
+                fn.children[3].insert(0, ExprStmtAST(register))
+        return self.names
+
+
+class ProfileGuidedOptimizer:
+    def __init__(self, profile, bias=0.9, min_count=100):
+        self.profile = profile
+        self.bias = bias
+        self.min_count = min_count
+        self.report = []
+
+    def run(self, module):
+        self.variants = {}
+        for decl in module.children:
+            if isinstance(decl, EnumDeclAST):
+                for variant in decl.children[1]:
+                    self.variants[variant.children[0]] = variant.children[1]
+
+        for fn in [decl for decl in module.children if isinstance(decl, FnDeclAST)]:
+            for key, node in list(probes(fn)):
+                if isinstance(node, FnDeclAST):
+                    self.mark_cold(key, node)
+                elif isinstance(node, IfStmtAST):
+                    self.expect(key, node)
+                elif isinstance(node, MatchExprAST):
+                    self.reorder(key, node)
+        return self.report
+
+    def mark_cold(self, key, fn):
+        name = fn.children[0]
+        if self.profile.get(key) != 0 or name == "main" or "export" in fn.attrs:
+            return
+        fn.attrs.add("cold")
+        self.report.append((name, "cold", "never called"))
+
+    def expect(self, key, node):
+        taken = self.profile.get(key + ":then")
+        skipped = self.profile.get(key + ":else")
+        if taken is None or skipped is None or taken + skipped < self.min_count:
+            return
+        ratio = taken / (taken + skipped)
+        if ratio >= self.bias:
+            likely = 1
+        elif ratio <= 1 - self.bias:
+            likely = 0
+        else:
+            return
+        cond = node.children[0]
+        flag = UnOpAST("!", UnOpAST("!", cond))
+        node.replace_child(cond, CallExprAST("__builtin_expect", [flag, LiteralAST(likely, int)]))
+        self.report.append((key.split(":")[0], key, f"taken {ratio:.0%}"))
+
+    def pattern_value(self, case):
+        # The constant an arm compares against, or None when the arm is not
+        # a plain literal / enum variant and so might overlap another arm.
+        pattern = case.children[0]
+        if not isinstance(pattern, ExprPatternAST):
+            return None
+        value = pattern.children[0]
+        if isinstance(value, VarRefAST) and value.children[0] in self.variants:
+            value = self.variants[value.children[0]]
+        if isinstance(value, LiteralAST):
+            return value.children[0], value.children[1]
+        return None
+
+    def reorder(self, key, node):
+        # The subject is re-evaluated for every arm tried, so only reorder
+        # when that cannot be observed and the arms cannot overlap.
+        subject, cases = node.children
+        if any(isinstance(child, CallExprAST) for child in walk(subject)):
+            return
+        counts = [self.profile.get(f"{key}:{arm}") for arm in range(len(cases))]
+        if None in counts or sum(counts) < self.min_count:
+            return
+        arms = [(case, hits) for case, hits in zip(cases, counts) if isinstance(case.children[0], ExprPatternAST)]
+        values = [self.pattern_value(case) for case, _ in arms]
+        if None in values or len(set(values)) != len(values):
+            return
+
+        ordered = [case for case, _ in sorted(arms, key=lambda arm: -arm[1])]
+        rest = [case for case in cases if not isinstance(case.children[0], ExprPatternAST)]
+        if ordered + rest != cases:
+            node.children[1] = ordered + rest
+            self.report.append((key.split(":")[0], key, "arms reordered by frequency"))
+
+    def format_report(self):
+        return "\n".join(f"{fn}: {what} {detail}" for fn, what, detail in self.report)
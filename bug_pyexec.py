@@ -0,0 +1,421 @@
+import ast
+import codecs
+import keyword
+import struct
+
+from bug_ast import *
+from bug_parser import parse
+from bug_types import TypeEnv
+
+INT_BITS = {"char": 8, "i32": 32, "i64": 64}
+FLOAT_TYPES = ("f32", "f64")
+ARITHMETIC = {"+": ast.Add, "-": ast.Sub, "*": ast.Mult, "/": ast.Div, "%": ast.Mod}
+COMPARE = {"==": ast.Eq, "!=": ast.NotEq, "<": ast.Lt, ">": ast.Gt, "<=": ast.LtE, ">=": ast.GtE}
+LVALUES = (VarRefAST, FieldAccessExprAST, ArrayAccessExprAST)
+
+
+def kind(_type):
+    return _type.children[0] if isinstance(_type, TypeAST) else None
+
+
+def wrap(value, bits):
+    # Two's complement wrap-around, written out as arithmetic so that the
+    # hot path does not pay for a helper call.
+    half = 1 << (bits - 1)
+    shifted = ast.BinOp(value, ast.Add(), ast.Constant(half))
+    masked = ast.BinOp(shifted, ast.BitAnd(), ast.Constant((1 << bits) - 1))
+    return ast.BinOp(masked, ast.Sub(), ast.Constant(half))
+
+
+def wrap_constant(value, bits):
+    half = 1 << (bits - 1)
+    return ((value + half) & ((1 << bits) - 1)) - half
+
+
+def call(name, *args):
+    return ast.Call(ast.Name(name, ast.Load()), list(args), [])
+
+
+def call_method(value, name, *args):
+    return ast.Call(ast.Attribute(value, name, ast.Load()), list(args), [])
+
+
+def c_div(a, b):
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def c_mod(a, b):
+    return a - b * c_div(a, b)
+
+
+def any_div(a, b):
+    # Division whose operand types inference could not tell (e.g. a match
+    # expression): C semantics for integer values, true division otherwise.
+    if type(a) in (int, bool) and type(b) in (int, bool):
+        return c_div(a, b)
+    return a / b
+
+
+def to_f32(value):
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+class PythonLowering:
+    def __init__(self, module):
+        self.env = TypeEnv(module)
+        self.structs = {
+            decl.children[0]: decl.children[1]
+            for decl in module.children
+            if isinstance(decl, StructDeclAST)
+        }
+        self.ret_type = None
+        self.counter = 0
+
+    def visit(self, node):
+        method_name = "visit_" + type(node).__name__
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+    def generic_visit(self, node):
+        raise Exception(f"No visit_{type(node).__name__} method")
+
+    @staticmethod
+    def name(name):
+        return name + "_" if keyword.iskeyword(name) else name
+
+    def load(self, name):
+        return ast.Name(self.name(name), ast.Load())
+
+    def store(self, name):
+        return ast.Name(self.name(name), ast.Store())
+
+    def block(self, stmts):
+        lowered = []
+        for stmt in stmts:
+            if isinstance(stmt, BaseAST):
+                lowered += self.visit(stmt)
+        return lowered or [ast.Pass()]
+
+    def zero(self, _type):
+        _kind = kind(_type)
+        if _kind in INT_BITS or _kind in self.env.enums:
+            return ast.Constant(0)
+        if _kind == "bool":
+            return ast.Constant(False)
+        if _kind in FLOAT_TYPES:
+            return ast.Constant(0.0)
+        if _kind == "array":
+            if len(_type.children) < 3:
+                return ast.List([], ast.Load())
+            return self.zero_array(_type.children[1], _type.children[2])
+        if _kind in self.structs:
+            return call(self.name(_kind), *(self.zero(field.children[1]) for field in self.structs[_kind]))
+        return ast.Constant(None)
+
+    def zero_array(self, element, count):
+        if kind(element) in self.structs or kind(element) == "array":
+            return ast.ListComp(
+                self.zero(element),
+                [ast.comprehension(ast.Name("_", ast.Store()), call("range", ast.Constant(count)), [], 0)],
+            )
+        return ast.BinOp(ast.List([self.zero(element)], ast.Load()), ast.Mult(), ast.Constant(count))
+
+    def convert(self, node, target):
+        # Lowers `node` as a value stored into something of type `target`,
+        # applying C's implicit conversions and struct value semantics.
+        target_kind = kind(target)
+        if target_kind == "array" and isinstance(node, ListAST):
+            return self.array_literal(node, target)
+
+        value = self.visit(node)
+        source_kind = kind(self.env.infer(node))
+        if target_kind in INT_BITS:
+            bits = INT_BITS[target_kind]
+            if isinstance(value, ast.Constant) and type(value.value) is int:
+                return ast.Constant(wrap_constant(value.value, bits))
+            if source_kind in FLOAT_TYPES:
+                return wrap(call("int", value), bits)
+            if source_kind not in INT_BITS or INT_BITS[source_kind] > bits:
+                if source_kind != "bool":
+                    return wrap(value, bits)
+        elif target_kind == "bool" and source_kind != "bool":
+            return call("bool", value)
+        elif target_kind == "f64" and source_kind not in FLOAT_TYPES:
+            return call("float", value)
+        elif target_kind == "f32" and source_kind != "f32":
+            return call("_bug_f32", value)
+        elif target_kind in self.structs and isinstance(node, LVALUES):
+            return call_method(value, "_copy")
+        return value
+
+    def array_literal(self, node, _type):
+        element = _type.children[1]
+        items = ast.List([self.convert(child, element) for child in node.children], ast.Load())
+        if len(_type.children) == 3 and len(node.children) < _type.children[2]:
+            return ast.BinOp(items, ast.Add(), self.zero_array(element, _type.children[2] - len(node.children)))
+        return items
+
+    def condition(self, node):
+        if isinstance(node, BinOpAST) and node.children[0] in ("&&", "||"):
+            op = ast.And() if node.children[0] == "&&" else ast.Or()
+            return ast.BoolOp(op, [self.condition(node.children[1]), self.condition(node.children[2])])
+        return self.visit(node)
+
+    def visit_ModuleAST(self, node):
+        body = []
+        for decl in node.children:
+            if isinstance(decl, FnDeclAST):
+                self.env.enter(decl)
+            else:
+                self.env.locals = {}
+            body += self.visit(decl)
+        return ast.Module(body, [])
+
+    def visit_StructDeclAST(self, node):
+        name = self.name(node.children[0])
+        fields = [self.name(field.children[0]) for field in node.children[1]]
+        copies = []
+        for field in node.children[1]:
+            field_name = self.name(field.children[0])
+            _type = field.children[1]
+            if kind(_type) in self.structs:
+                copies.append(f"self.{field_name}._copy()")
+            elif kind(_type) == "array" and kind(_type.children[1]) in self.structs:
+                copies.append(f"[item._copy() for item in self.{field_name}]")
+            elif kind(_type) == "array" and len(_type.children) == 3:
+                copies.append(f"list(self.{field_name})")
+            else:
+                copies.append(f"self.{field_name}")
+
+        assignments = "".join(f"        self.{field} = {field}\n" for field in fields)
+        source = (
+            f"class {name}:\n"
+            f"    __slots__ = {tuple(fields)!r}\n"
+            f"    def __init__(self, {', '.join(fields)}):\n"
+            f"{assignments}"
+            f"    def _copy(self):\n"
+            f"        return {name}({', '.join(copies)})\n"
+        )
+        return ast.parse(source).body
+
+    def visit_EnumDeclAST(self, node):
+        return [
+            ast.Assign([self.store(variant.children[0])], self.visit(variant.children[1]))
+            for variant in node.children[1]
+        ]
+
+    def visit_FnDeclAST(self, node):
+        name, params, ret_type, body = node.children
+        self.ret_type = ret_type
+        stmts = []
+        assigned = {
+            child.children[0]
+            for child in walk(body)
+            if isinstance(child, AssignStmtAST) and isinstance(child.children[0], str)
+        }
+        shared = sorted(name for name in assigned if not self.env.is_local(name))
+        if shared:
+            stmts.append(ast.Global([self.name(name) for name in shared]))
+        # Structs are passed by value: copy them on entry, so callers from
+        # Python get C semantics too.
+        for param in params:
+            if kind(param.children[1]) in self.structs:
+                param_name = param.children[0]
+                stmts.append(ast.Assign([self.store(param_name)], call_method(self.load(param_name), "_copy")))
+        stmts += self.block(body)
+
+        args = ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(self.name(param.children[0])) for param in params],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        )
+        fields = {"name": self.name(name), "args": args, "body": stmts, "decorator_list": []}
+        if "type_params" in ast.FunctionDef._fields:
+            fields["type_params"] = []
+        return [ast.FunctionDef(**fields)]
+
+    def visit_VarDeclAST(self, node):
+        name, _type, value = node.children
+        if value is None:
+            lowered = self.zero(_type)
+        else:
+            lowered = self.convert(value, _type)
+        return [ast.Assign([self.store(name)], lowered)]
+
+    def visit_ConstTableDeclAST(self, node):
+        return self.visit_VarDeclAST(node)
+
+    def visit_ExprStmtAST(self, node):
+        return [ast.Expr(self.visit(node.children[0]))]
+
+    def visit_ReturnStmtAST(self, node):
+        if node.children[0] is None:
+            return [ast.Return(None)]
+        if self.ret_type is None or kind(self.ret_type) == "void":
+            return [ast.Return(self.visit(node.children[0]))]
+        return [ast.Return(self.convert(node.children[0], self.ret_type))]
+
+    def visit_IfStmtAST(self, node):
+        orelse = []
+        if len(node.children) == 3:
+            if isinstance(node.children[2], IfStmtAST):
+                orelse = self.visit(node.children[2])
+            else:
+                orelse = self.block(node.children[2])
+        return [ast.If(self.condition(node.children[0]), self.block(node.children[1]), orelse)]
+
+    def visit_LoopStmtAST(self, node):
+        # Same semantics as the C backend, which emits `while (cond) { body }`.
+        return [ast.While(self.condition(node.children[1]), self.block(node.children[0]), [])]
+
+    def visit_BlockStmtAST(self, node):
+        return self.block(node.children[0])
+
+    def visit_AssignStmtAST(self, node):
+        target, value = node.children
+        if isinstance(target, str):
+            return [ast.Assign([self.store(target)], self.convert(value, self.env.lookup(target)))]
+        lowered = self.visit(target)
+        lowered.ctx = ast.Store()
+        return [ast.Assign([lowered], self.convert(value, self.env.infer(target)))]
+
+    def visit_GeneralExprAST(self, node):
+        return self.visit(node.children[0])
+
+    def visit_LiteralAST(self, node):
+        value, _type = node.children
+        if _type == bool:
+            return ast.Constant(value == "true")
+        if _type == str:
+            return ast.Constant(codecs.decode(value, "unicode_escape"))
+        return ast.Constant(value)
+
+    def visit_VarRefAST(self, node):
+        return self.load(node.children[0])
+
+    def visit_BinOpAST(self, node):
+        op, left, right = node.children
+        if op in ("&&", "||"):
+            return call("bool", self.condition(node))
+        if op in COMPARE:
+            return ast.Compare(self.visit(left), [COMPARE[op]()], [self.visit(right)])
+
+        _kind = kind(self.env.infer(node))
+        if _kind in INT_BITS and op == "/":
+            value = call("_bug_div", self.visit(left), self.visit(right))
+        elif _kind is None and op == "/":
+            value = call("_bug_any_div", self.visit(left), self.visit(right))
+        elif (_kind in INT_BITS or _kind is None) and op == "%":
+            value = call("_bug_mod", self.visit(left), self.visit(right))
+        else:
+            value = ast.BinOp(self.visit(left), ARITHMETIC[op](), self.visit(right))
+        if _kind in INT_BITS:
+            return wrap(value, INT_BITS[_kind])
+        return value
+
+    def visit_UnOpAST(self, node):
+        op, operand = node.children
+        if op == "!":
+            return ast.UnaryOp(ast.Not(), self.visit(operand))
+        if op == "+":
+            return self.visit(operand)
+        value = ast.UnaryOp(ast.USub(), self.visit(operand))
+        _kind = kind(self.env.infer(operand))
+        if _kind in INT_BITS:
+            return wrap(value, INT_BITS[_kind])
+        return value
+
+    def visit_CallExprAST(self, node):
+        name, args = node.children
+        fn = self.env.functions.get(name)
+        if fn is None:
+            return call(self.name(name), *(self.visit(arg) for arg in args))
+        params = fn.children[1]
+        return call(
+            self.name(name),
+            *(
+                self.visit(arg) if kind(param.children[1]) in self.structs else self.convert(arg, param.children[1])
+                for arg, param in zip(args, params)
+            ),
+        )
+
+    def visit_FieldAccessExprAST(self, node):
+        return ast.Attribute(self.visit(node.children[0]), self.name(node.children[1]), ast.Load())
+
+    def visit_ArrayAccessExprAST(self, node):
+        return ast.Subscript(self.visit(node.children[0]), self.visit(node.children[1]), ast.Load())
+
+    def visit_MatchExprAST(self, node):
+        # Arms are tried in order against a subject evaluated once; without
+        # a wildcard arm an unmatched match evaluates to None.
+        self.counter += 1
+        subject = f"_bug_match{self.counter}"
+        cases = []
+        default = ast.Constant(None)
+        for case in node.children[1]:
+            pattern, arm = case.children
+            if isinstance(pattern, WildcardPatternAST):
+                default = self.visit(arm)
+                break
+            cases.append((self.visit(pattern.children[0]), self.visit(arm)))
+
+        bound = ast.NamedExpr(ast.Name(subject, ast.Store()), self.visit(node.children[0]))
+        if not cases:
+            return ast.Subscript(ast.Tuple([bound, default], ast.Load()), ast.Constant(1), ast.Load())
+
+        chain = default
+        for index, (pattern, arm) in reversed(list(enumerate(cases))):
+            left = bound if index == 0 else ast.Name(subject, ast.Load())
+            chain = ast.IfExp(ast.Compare(left, [ast.Eq()], [pattern]), arm, chain)
+        return chain
+
+    def visit_ListAST(self, node):
+        return ast.List([self.visit(child) for child in node.children], ast.Load())
+
+    def visit_NewStructAST(self, node):
+        name, values = node.children
+        given = {value.children[0]: value.children[1] for value in values}
+        args = []
+        for field in self.structs[name]:
+            field_name, _type = field.children
+            if field_name in given:
+                args.append(self.convert(given[field_name], _type))
+            else:
+                args.append(self.zero(_type))
+        return call(self.name(name), *args)
+
+
+class Program:
+    # A .bug module compiled to Python functions. Functions, struct classes
+    # and globals are attributes; println/print_int write to `output`.
+    def __init__(self, module, filename="<bug>"):
+        self.output = []
+        self.namespace = {
+            "println": lambda text: self.output.append(f"{text}\n"),
+            "print_int": lambda value: self.output.append("%d" % value),
+            "print_f64": lambda value: self.output.append("%.9f" % value),
+            "_bug_div": c_div,
+            "_bug_mod": c_mod,
+            "_bug_any_div": any_div,
+            "_bug_f32": to_f32,
+        }
+        tree = ast.fix_missing_locations(PythonLowering(module).visit(module))
+        exec(compile(tree, filename, "exec"), self.namespace)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["namespace"][PythonLowering.name(name)]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def read_output(self):
+        text = "".join(self.output)
+        self.output.clear()
+        return text
+
+
+def load(source, filename="<bug>"):
+    return Program(parse(source), filename)
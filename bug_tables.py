@@ -0,0 +1,84 @@
+from bug_ast import *
+from bug_inline import nested_bodies
+
+
+def is_constant_list(node):
+    return isinstance(node, ListAST) and all(isinstance(element, LiteralAST) for element in node.children)
+
+
+def table_key(decl):
+    _type = decl.children[1]
+    return (
+        repr(_type),
+        tuple((element.children[0], element.children[1]) for element in decl.children[2].children),
+    )
+
+
+class ConstantTables:
+    def __init__(self):
+        self.report = []
+
+    def run(self, module):
+        # References to a module-level name outside the local's scope (e.g.
+        # before its `let`) are not the table; leave such locals alone.
+        self.module_names = {decl.children[0] for decl in module.children if isinstance(decl, VarDeclAST)}
+        self.module_names |= {
+            variant.children[0]
+            for decl in module.children
+            if isinstance(decl, EnumDeclAST)
+            for variant in decl.children[1]
+        }
+        tables = {}
+        for decl in list(module.children):
+            if isinstance(decl, FnDeclAST):
+                self.hoist(module, decl, tables)
+        return self.report
+
+    def hoist(self, module, fn, tables):
+        name, params, _, body = fn.children
+        decls = [node for node in walk(body) if isinstance(node, VarDeclAST)]
+        for decl in decls:
+            local = decl.children[0]
+            if decl.children[1].children[0] != "array" or not is_constant_list(decl.children[2]):
+                continue
+            if local in self.module_names or any(param.children[0] == local for param in params):
+                continue
+            if sum(1 for other in decls if other.children[0] == local) > 1:
+                continue
+            if not self.read_only(body, local):
+                continue
+
+            key = table_key(decl)
+            if key not in tables:
+                table = ConstTableDeclAST(f"_table_{name}_{local}", decl.children[1], decl.children[2])
+                module.children.insert(module.children.index(fn), table)
+                table.parent = module
+                tables[key] = table.children[0]
+
+            self.remove_decl(body, decl)
+            for node in walk(body):
+                if isinstance(node, VarRefAST) and node.children[0] == local:
+                    node.children[0] = tables[key]
+            self.report.append((name, local, tables[key]))
+
+    def read_only(self, body, local):
+        # The table may only ever be indexed: no assignments to it or its
+        # elements, and it must not escape as a value (e.g. a call argument).
+        for node in walk(body):
+            if isinstance(node, AssignStmtAST):
+                target = node.children[0]
+                if target == local or any(
+                    isinstance(ref, VarRefAST) and ref.children[0] == local for ref in walk(target)
+                ):
+                    return False
+            if isinstance(node, VarRefAST) and node.children[0] == local:
+                parent = node.parent
+                if not isinstance(parent, ArrayAccessExprAST) or parent.children[0] is not node:
+                    return False
+        return True
+
+    def remove_decl(self, body, decl):
+        if any(stmt is decl for stmt in body):
+            body.remove(decl)
+            return True
+        return any(self.remove_decl(nested, decl) for stmt in body for nested in nested_bodies(stmt))
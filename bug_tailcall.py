@@ -0,0 +1,151 @@
+from bug_ast import *
+from bug_inline import is_void
+
+
+class TailCallEliminator:
+    def __init__(self, max_duplicate_size=8):
+        # Moving the statements after an `if` into its branches may copy
+        # them; only small tails are copied into more than one branch.
+        self.max_duplicate_size = max_duplicate_size
+        self.report = []
+
+    def run(self, module):
+        for decl in module.children:
+            if isinstance(decl, FnDeclAST):
+                self.transform(decl)
+        return self.report
+
+    def transform(self, fn):
+        self.name, params, ret_type, body = fn.children
+        self.params = params
+        if any(param.children[1].children[0] == "array" for param in params):
+            return
+        if not any(self.is_self_call(node) for node in walk(body)):
+            return
+
+        body = clone(body)
+        if is_void(ret_type):
+            body.append(ReturnStmtAST(None))
+        body = self.restructure(body)
+        self.converted = 0
+        self.rewrite(body)
+        if self.converted == 0:
+            return
+
+        fn.children[3] = [LoopStmtAST(body, LiteralAST(1, int))]
+        self.report.append((self.name, self.converted))
+
+    def is_self_call(self, node):
+        return (
+            isinstance(node, CallExprAST)
+            and node.children[0] == self.name
+            and len(node.children[1]) == len(self.params)
+        )
+
+    def is_tail_call(self, stmt):
+        return isinstance(stmt, (ReturnStmtAST, ExprStmtAST)) and self.is_self_call(stmt.children[0])
+
+    def contains_tail_call(self, stmts):
+        return any(
+            self.is_tail_call(node)
+            for stmt in stmts
+            for node in walk(stmt)
+        )
+
+    def returns(self, stmts):
+        if not stmts:
+            return False
+        last = stmts[-1]
+        if isinstance(last, ReturnStmtAST):
+            return True
+        if isinstance(last, IfStmtAST):
+            return all(
+                self.returns(owner.children[index]) if index < len(owner.children) else False
+                for owner, index in self.branches(last)
+            )
+        return False
+
+    def branches(self, stmt):
+        # (if statement, child index) for every branch body, including a
+        # missing final else which is reported as an index past the end.
+        slots = [(stmt, 1)]
+        if len(stmt.children) == 3 and isinstance(stmt.children[2], IfStmtAST):
+            slots += self.branches(stmt.children[2])
+        else:
+            slots.append((stmt, 2))
+        return slots
+
+    def restructure(self, stmts):
+        # Makes every self tail call the last statement executed on its path
+        # by moving the statements following an `if` into the branches of
+        # that `if` which fall through.
+        for index, stmt in enumerate(stmts):
+            if isinstance(stmt, ReturnStmtAST):
+                stmts = stmts[:index + 1]
+                break
+            if not isinstance(stmt, IfStmtAST) or index == len(stmts) - 1:
+                continue
+            if not self.contains_tail_call([stmt]):
+                continue
+
+            rest = stmts[index + 1:]
+            open_slots = [
+                (owner, slot)
+                for owner, slot in self.branches(stmt)
+                if slot >= len(owner.children) or not self.returns(owner.children[slot])
+            ]
+            size = sum(1 for _ in walk(rest))
+            if len(open_slots) > 1 and size > self.max_duplicate_size:
+                continue
+
+            for owner, slot in open_slots:
+                if slot < len(owner.children):
+                    owner.children[slot] = owner.children[slot] + clone(rest)
+                else:
+                    owner.add_child(clone(rest))
+            stmts = stmts[:index + 1]
+            break
+
+        if stmts and isinstance(stmts[-1], IfStmtAST):
+            for owner, slot in self.branches(stmts[-1]):
+                if slot < len(owner.children):
+                    owner.children[slot] = self.restructure(owner.children[slot])
+
+        return self.merge_void_calls(stmts)
+
+    def merge_void_calls(self, stmts):
+        # `f(x); return ...;` in a function returning void is a tail call too.
+        if (
+            len(stmts) >= 2
+            and isinstance(stmts[-1], ReturnStmtAST)
+            and isinstance(stmts[-2], ExprStmtAST)
+            and self.is_self_call(stmts[-2].children[0])
+            and stmts[-1].children[0] is None
+        ):
+            return stmts[:-2] + [ReturnStmtAST(stmts[-2].children[0])]
+        return stmts
+
+    def rewrite(self, stmts):
+        if not stmts:
+            return
+        last = stmts[-1]
+        if isinstance(last, ReturnStmtAST) and self.is_self_call(last.children[0]):
+            stmts[-1] = self.rebind(last.children[0])
+            self.converted += 1
+        elif isinstance(last, IfStmtAST):
+            for owner, slot in self.branches(last):
+                if slot < len(owner.children):
+                    self.rewrite(owner.children[slot])
+
+    def rebind(self, call):
+        # Arguments are evaluated into temporaries first so that parameters
+        # referenced by later arguments still hold their old values.
+        temps = []
+        assigns = []
+        for param, arg in zip(self.params, call.children[1]):
+            name = param.children[0]
+            if isinstance(arg, VarRefAST) and arg.children[0] == name:
+                continue
+            temps.append(VarDeclAST("_tail_" + name, clone(param.children[1]), arg))
+            assigns.append(AssignStmtAST(name, VarRefAST("_tail_" + name)))
+        return BlockStmtAST(temps + assigns)
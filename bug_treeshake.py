@@ -0,0 +1,68 @@
+from bug_ast import *
+from bug_callgraph import CallGraph
+
+KINDS = {FnDeclAST: "fn", StructDeclAST: "struct", EnumDeclAST: "enum"}
+
+
+class TreeShaker:
+    def __init__(self):
+        self.removed = []
+        self.kept = 0
+
+    def run(self, module):
+        graph = CallGraph(module)
+        types = {
+            decl.children[0]: decl
+            for decl in module.children
+            if isinstance(decl, (StructDeclAST, EnumDeclAST))
+        }
+        variants = {
+            variant.children[0]: decl
+            for decl in module.children
+            if isinstance(decl, EnumDeclAST)
+            for variant in decl.children[1]
+        }
+
+        # Globals are always emitted, so whatever their types and
+        # initializers use is live too.
+        roots = [
+            decl
+            for decl in module.children
+            if isinstance(decl, VarDeclAST)
+            or isinstance(decl, FnDeclAST) and (decl.children[0] == "main" or "export" in decl.attrs)
+        ]
+        live = set()
+        pending = list(roots)
+        while pending:
+            decl = pending.pop()
+            if id(decl) in live:
+                continue
+            live.add(id(decl))
+            # Calls are followed wherever they appear, including global
+            # initializers, not just function bodies.
+            for node in walk(decl):
+                if isinstance(node, CallExprAST):
+                    used = graph.functions.get(node.children[0])
+                elif isinstance(node, (TypeAST, NewStructAST)):
+                    used = types.get(node.children[0])
+                elif isinstance(node, VarRefAST):
+                    used = variants.get(node.children[0])
+                else:
+                    continue
+                if used is not None:
+                    pending.append(used)
+
+        kept = []
+        for decl in module.children:
+            if isinstance(decl, tuple(KINDS)) and id(decl) not in live:
+                self.removed.append((KINDS[type(decl)], decl.children[0], decl.lineno))
+            else:
+                kept.append(decl)
+        module.children = kept
+        self.kept = sum(1 for decl in kept if isinstance(decl, tuple(KINDS)))
+        return self.removed
+
+    def format_report(self):
+        lines = [f"removed {kind} {name} (line {line})" for kind, name, line in self.removed]
+        lines.append(f"tree shaking removed {len(self.removed)} declarations, kept {self.kept}")
+        return "\n".join(lines)
@@ -0,0 +1,85 @@
+from bug_ast import *
+
+NUMERIC_RANKS = {"char": 0, "bool": 0, "i32": 1, "i64": 2, "f32": 3, "f64": 4}
+COMPARISONS = ("==", "!=", "<", ">", "<=", ">=", "&&", "||")
+
+
+class TypeEnv:
+    def __init__(self, module):
+        self.globals = {}
+        self.functions = {}
+        self.structs = {}
+        self.enums = set()
+        self.variants = set()
+        self.locals = {}
+        for decl in module.children:
+            if isinstance(decl, VarDeclAST):
+                self.globals[decl.children[0]] = decl.children[1]
+            elif isinstance(decl, FnDeclAST):
+                self.functions[decl.children[0]] = decl
+            elif isinstance(decl, StructDeclAST):
+                self.structs[decl.children[0]] = {
+                    field.children[0]: field.children[1] for field in decl.children[1]
+                }
+            elif isinstance(decl, EnumDeclAST):
+                self.enums.add(decl.children[0])
+                self.variants.update(variant.children[0] for variant in decl.children[1])
+
+    def enter(self, fn):
+        self.locals = {param.children[0]: param.children[1] for param in fn.children[1]}
+        for node in walk(fn.children[3]):
+            if isinstance(node, VarDeclAST):
+                self.locals[node.children[0]] = node.children[1]
+
+    def is_local(self, name):
+        return name in self.locals
+
+    def lookup(self, name):
+        if name in self.locals:
+            return self.locals[name]
+        if name in self.globals:
+            return self.globals[name]
+        if name in self.variants:
+            return TypeAST("i32")
+        return None
+
+    def infer(self, node):
+        if isinstance(node, LiteralAST):
+            return TypeAST({int: "i32", float: "f64", bool: "bool", str: "string"}[node.children[1]])
+        if isinstance(node, VarRefAST):
+            return self.lookup(node.children[0])
+        if isinstance(node, BinOpAST):
+            if node.children[0] in COMPARISONS:
+                return TypeAST("bool")
+            return self.wider(self.infer(node.children[1]), self.infer(node.children[2]))
+        if isinstance(node, UnOpAST):
+            if node.children[0] == "!":
+                return TypeAST("bool")
+            return self.infer(node.children[1])
+        if isinstance(node, ArrayAccessExprAST):
+            base = self.infer(node.children[0])
+            if base is not None and base.children[0] in ("array", "ptr"):
+                return base.children[1]
+            return None
+        if isinstance(node, FieldAccessExprAST):
+            base = self.infer(node.children[0])
+            if base is None or base.children[0] not in self.structs:
+                return None
+            return self.structs[base.children[0]].get(node.children[1])
+        if isinstance(node, CallExprAST):
+            fn = self.functions.get(node.children[0])
+            return fn.children[2] if fn is not None else None
+        if isinstance(node, NewStructAST):
+            return TypeAST(node.children[0])
+        return None
+
+    @staticmethod
+    def wider(left, right):
+        if left is None or right is None:
+            return None
+        if left.children[0] not in NUMERIC_RANKS or right.children[0] not in NUMERIC_RANKS:
+            return None
+        widest = max(left, right, key=lambda _type: NUMERIC_RANKS[_type.children[0]])
+        if NUMERIC_RANKS[widest.children[0]] == 0:
+            return TypeAST("i32")
+        return widest
@@ -1,14 +1,57 @@
-from sys import argv
-
-from bug_ast import TypeAST
-from bug_parser import parser
+import argparse
+import json
+import marshal
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from sys import stderr
+
+from bug_ast import *
+from bug_cse import CommonSubexpressionEliminator
+from bug_inline import Inliner
+from bug_layout import StructLayout
+from bug_openmp import ParallelLoops
+import bug_pratt
+from bug_parser import parse
+from bug_profile import Instrumenter, ProfileGuidedOptimizer, load_profile
+from bug_tables import ConstantTables
+from bug_tailcall import TailCallEliminator
+from bug_treeshake import TreeShaker
+
+PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3,
+    "<": 4, ">": 4, "<=": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6, "%": 6,
+}
+
+# Nodes that get a #line directive when line directives are enabled.
+LOCATED = (DeclAST, StatementAST)
+
+LINE_DIRECTIVE = re.compile(r'^#line (\d+) "(?:[^"\\]|\\.)*"(?: // col (\d+))?$')
+
+# Shards per worker process in parallel codegen, so one slow shard does not
+# leave the other workers idle at the end.
+SHARDS_PER_JOB = 4
+
+# Functions being generated in parallel, inherited by forked workers.
+forked_functions = None
+
+# Functions up to this many AST nodes get an `inline` hint in optimized mode.
+INLINE_HINT_SIZE = 40
 
 
 class Visitor:
     def visit(self, node):
         method_name = "visit_" + type(node).__name__
         visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+        code = visitor(node)
+        if self.source_name is not None and isinstance(node, LOCATED) and node.lineno is not None:
+            code = f'\n#line {node.lineno} "{self.source_name}" // col {node.col}\n{code}'
+        return code
 
     def generic_visit(self, node):
         raise Exception(f"No visit_{type(node).__name__} method")
@@ -34,14 +77,114 @@ class Visitor:
         else:
             return _type
 
+    def __init__(self, optimized=False, unity=False, source_name=None, jobs=1):
+        # optimized: static linkage for functions that are not main or
+        # @export, const for bindings that are never reassigned, and
+        # prototypes so definition order does not matter.
+        # unity: paste the bug.c runtime into the output file.
+        # source_name: emit #line directives pointing into this .bug file.
+        # jobs: emit functions in this many worker processes.
+        self.optimized = optimized
+        self.unity = unity
+        self.source_name = source_name
+        self.jobs = jobs
+        self.assigned = set()
+        self.module_assigned = set()
+
+    @staticmethod
+    def assigned_names(node):
+        names = set()
+        for child in walk(node):
+            if isinstance(child, AssignStmtAST):
+                target = child.children[0]
+                if isinstance(target, str):
+                    names.add(target)
+                else:
+                    names.update(ref.children[0] for ref in walk(target) if isinstance(ref, VarRefAST))
+            elif isinstance(child, ParallelLoopStmtAST):
+                names.add(child.children[0])
+        return names
+
+    def is_const(self, name, _type):
+        if not self.optimized or name in self.assigned:
+            return False
+        return isinstance(_type, TypeAST) and _type.children[0] not in ("array", "ptr")
+
+    def runtime(self):
+        root = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(root, "bug.h")) as f:
+            header = f.read()
+        with open(os.path.join(root, "bug.c")) as f:
+            source = f.read().replace('#include "bug.h"\n', "")
+        return f"#define BUG_API static inline\n{header}\n{source}\n"
+
     def visit_ModuleAST(self, node):
-        code = "#include <stdio.h>\n#include \"bug.h\"\n"
-        for decl in node.children:
+        if self.unity:
+            code = self.runtime()
+        else:
+            code = "#include <stdio.h>\n#include \"bug.h\"\n"
+
+        if self.optimized:
+            self.module_assigned = self.assigned = self.assigned_names(node)
+        functions = [decl for decl in node.children if isinstance(decl, FnDeclAST)]
+        emitted = self.emit_functions(functions)
+
+        if not self.optimized:
+            definitions = iter(emitted)
+            for decl in node.children:
+                if isinstance(decl, FnDeclAST):
+                    code += next(definitions)[1]
+                else:
+                    code += self.visit(decl)
+            return code
+
+        types = [decl for decl in node.children if isinstance(decl, (StructDeclAST, EnumDeclAST))]
+        variables = [decl for decl in node.children if isinstance(decl, VarDeclAST)]
+        for decl in types:
             code += self.visit(decl)
+        for decl in variables:
+            code += self.visit(decl).rstrip("\n") + "\n"
+        for prototype, _ in emitted:
+            code += prototype
+        code += "\n"
+        for _, definition in emitted:
+            code += definition
 
         return code
 
-    def visit_FnDeclAST(self, node):
+    def emit_functions(self, functions):
+        # (prototype, definition) of every function, in source order. Once
+        # types and module-wide facts are known functions are independent,
+        # so with jobs > 1 contiguous shards go to worker processes and come
+        # back in order. Forked workers already hold the tree and only get
+        # index ranges; otherwise shards travel as marshalled `pack` trees.
+        if self.jobs <= 1 or len(functions) < 2:
+            return emit(self, functions)
+
+        global forked_functions
+        size = -(-len(functions) // (self.jobs * SHARDS_PER_JOB))
+        ranges = [(start, min(start + size, len(functions))) for start in range(0, len(functions), size)]
+        options = {"optimized": self.optimized, "source_name": self.source_name}
+        fork = "fork" in multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork") if fork else None
+        forked_functions = functions if fork else None
+        try:
+            with ProcessPoolExecutor(self.jobs, mp_context=context) as pool:
+                if fork:
+                    results = [
+                        pool.submit(emit_range, options, self.module_assigned, start, stop)
+                        for start, stop in ranges
+                    ]
+                else:
+                    results = [
+                        pool.submit(emit_shard, options, self.module_assigned, marshal.dumps(pack(functions[start:stop])))
+                        for start, stop in ranges
+                    ]
+                return [item for result in results for item in result.result()]
+        finally:
+            forked_functions = None
+
+    def signature(self, node):
         name = node.children[0]
         params = []
         for param in node.children[1]:
@@ -49,12 +192,32 @@ class Visitor:
 
         params = ", ".join(params)
 
-        ret_type = ''.join(self.visit(node.children[2]))
+        if node.children[2] is None:
+            ret_type = "void"
+        else:
+            ret_type = ''.join(self.visit(node.children[2]))
+
+        if self.optimized and name != "main" and "export" not in node.attrs:
+            if sum(1 for _ in walk(node.children[3])) <= INLINE_HINT_SIZE:
+                ret_type = "static inline " + ret_type
+            else:
+                ret_type = "static " + ret_type
+        if "cold" in node.attrs:
+            ret_type = "__attribute__((cold)) " + ret_type
+
+        return f"{ret_type} {name}({params})"
+
+    def visit_FnDeclAST(self, node):
+        if self.optimized:
+            self.assigned = self.assigned_names(node.children[3])
+        signature = self.signature(node)
         body = ""
         for stmt in node.children[3]:
             body += self.visit(stmt) + "\n"
+        if self.optimized:
+            self.assigned = self.module_assigned
 
-        code = f"{ret_type} {name}({params}) {{\n"
+        code = f"{signature} {{\n"
         code += f"    {body}\n"
         code += "}\n\n"
 
@@ -63,11 +226,20 @@ class Visitor:
     def visit_VarDeclAST(self, node):
         name = self.visit(node.children[0])
         _type = self.visit(node.children[1])
+        if node.children[2] is None:
+            if len(_type) == 2:
+                return f"{_type[0]} {name}{_type[1]};"
+            return f"{_type} {name};"
         value = self.visit(node.children[2])
         if len(_type) == 2:
             return f"{_type[0]} {name}{_type[1]} = {value};"
+        if self.is_const(name, node.children[1]):
+            _type = "const " + _type
         return f"{_type} {name} = {value};"
 
+    def visit_ConstTableDeclAST(self, node):
+        return "static const " + self.visit_VarDeclAST(node) + "\n"
+
     def visit_StructDeclAST(self, node):
         name = self.visit(node.children[0])
         fields = self.visit(node.children[1])
@@ -93,12 +265,16 @@ class Visitor:
     def visit_ParamAST(self, node):
         name = node.children[0]
         _type = self.visit(node.children[1])
+        if self.is_const(name, node.children[1]):
+            _type = "const " + _type
 
         return f"{_type} {name}"
 
     def visit_FieldAST(self, node):
         name = node.children[0]
         _type = self.visit(node.children[1])
+        if isinstance(_type, tuple):
+            return f"{_type[0]} {name}{_type[1]};"
 
         return f"{_type} {name};"
 
@@ -125,12 +301,16 @@ class Visitor:
         return self.visit(node.children[0]) + ";"
 
     def visit_ReturnStmtAST(self, node):
+        if node.children[0] is None:
+            return "return;"
         return f"return {self.visit(node.children[0])};"
 
     def visit_IfStmtAST(self, node):
         condition = self.visit(node.children[0])
         body = "\n".join(self.visit(node.children[1]))
         if len(node.children) == 3:
+            if isinstance(node.children[2], IfStmtAST):
+                return f"if ({condition}) {{\n    {body}\n}} else {self.visit(node.children[2])}"
             else_body = "\n".join(self.visit(node.children[2]))
             return f"if ({condition}) {{\n    {body}\n}} else {{\n    {else_body}\n}}"
         return f"if ({condition}) {{\n    {body}\n}}"
@@ -140,11 +320,37 @@ class Visitor:
         body = "\n".join(self.visit(node.children[0]))
         return f"while ({cond}) {{\n    {body}\n}}"
 
+    def visit_ParallelLoopStmtAST(self, node):
+        counter, counter_type, op, limit, body = node.children
+        _type = self.visit(counter_type)
+        limit = self.visit(limit)
+        clauses = "".join(f" reduction({reduction}:{name})" for reduction, name in node.reductions)
+        body = "\n".join(self.visit(body))
+        # The loop variable shadows the counter; afterwards the counter gets
+        # the value the original loop would have left in it.
+        final = limit if op == "<" else f"({limit}) + 1"
+        return (
+            f"{{\n    const {_type} _omp_start = {counter};\n"
+            f"#pragma omp {node.mode}{clauses}\n"
+            f"    for ({_type} {counter} = _omp_start; {counter} {op} {limit}; {counter}++) {{\n    {body}\n}}\n"
+            f"    if ({counter} {op} {limit}) {{\n    {counter} = {final};\n}}\n}}"
+        )
+
     def visit_AssignStmtAST(self, node):
         name = self.visit(node.children[0])
         value = self.visit(node.children[1])
         return f"{name} = {value};"
 
+    def visit_BlockStmtAST(self, node):
+        body = "\n".join(self.visit(node.children[0]))
+        return f"{{\n    {body}\n}}"
+
+    def visit_GotoStmtAST(self, node):
+        return f"goto {node.children[0]};"
+
+    def visit_LabelStmtAST(self, node):
+        return f"{node.children[0]}: ;"
+
     def visit_GeneralExprAST(self, node):
         return self.visit(node.children[0])
 
@@ -154,7 +360,7 @@ class Visitor:
 
         return f"{name}({args})"
 
-    def visit_FieldAccessExpr(self, node):
+    def visit_FieldAccessExprAST(self, node):
         name = self.visit(node.children[0])
         field = self.visit(node.children[1])
 
@@ -197,11 +403,19 @@ class Visitor:
         op = self.visit(node.children[0])
         right = self.visit(node.children[2])
 
+        # The parser already resolved precedence; keep it in the C output.
+        if isinstance(node.children[1], BinOpAST) and PRECEDENCE[node.children[1].children[0]] < PRECEDENCE[op]:
+            left = f"({left})"
+        if isinstance(node.children[2], BinOpAST) and PRECEDENCE[node.children[2].children[0]] <= PRECEDENCE[op]:
+            right = f"({right})"
+
         return f"{left} {op} {right}"
 
-    def visit_UnaryOpAST(self, node):
+    def visit_UnOpAST(self, node):
         op = self.visit(node.children[0])
         operand = self.visit(node.children[1])
+        if isinstance(node.children[1], (BinOpAST, UnOpAST)):
+            operand = f"({operand})"
 
         return f"{op}{operand}"
 
@@ -222,10 +436,13 @@ class Visitor:
         return self.visit(node.children[0])
 
     def visit_NewStructAST(self, node):
-        # name = self.visit(node.children[0])
+        name = self.visit(node.children[0])
         fields = ','.join(self.visit(node.children[1]))
 
-        return f"{{ {fields} }}"
+        # Outside of an initializer a brace list needs to be a compound literal.
+        if isinstance(node.parent, VarDeclAST):
+            return f"{{ {fields} }}"
+        return f"({name}){{ {fields} }}"
 
     def visit_FieldValueAST(self, node):
         name = self.visit(node.children[0])
@@ -245,13 +462,124 @@ class Visitor:
         return x
 
 
+def emit(visitor, functions):
+    return [
+        (visitor.signature(fn) + ";\n" if visitor.optimized else None, visitor.visit(fn))
+        for fn in functions
+    ]
+
+
+def shard_visitor(options, module_assigned):
+    visitor = Visitor(**options)
+    visitor.module_assigned = visitor.assigned = module_assigned
+    return visitor
+
+
+def emit_range(options, module_assigned, start, stop):
+    return emit(shard_visitor(options, module_assigned), forked_functions[start:stop])
+
+
+def emit_shard(options, module_assigned, data):
+    return emit(shard_visitor(options, module_assigned), unpack(marshal.loads(data)))
+
+
+def source_map(code, source, generated=None):
+    # Maps every generated C line to the .bug line and column of the
+    # closest #line directive above it.
+    mappings = []
+    position = None
+    for number, line in enumerate(code.split("\n"), start=1):
+        match = LINE_DIRECTIVE.match(line)
+        if match:
+            column = match.group(2)
+            position = int(match.group(1)), int(column) if column is not None else None
+        elif position is not None and line.strip():
+            mappings.append({"c_line": number, "line": position[0], "column": position[1]})
+    return {"version": 1, "source": source, "generated": generated, "mappings": mappings}
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="Compile a .bug file to C")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--parser", choices=("ply", "pratt"), default="ply", help="parser engine (pratt: recursive descent, faster)")
+    arg_parser.add_argument("-o", "--output", help="write the C code here instead of stdout")
+    arg_parser.add_argument("--tail-calls", action="store_true", help="turn self tail calls into loops")
+    arg_parser.add_argument("--inline", action="store_true", help="inline small and single-use functions")
+    arg_parser.add_argument("--inline-size", type=int, default=40, help="largest callee (in AST nodes) inlined at every call site")
+    arg_parser.add_argument("--inline-once-size", type=int, default=200, help="largest callee inlined when it has a single call site")
+    arg_parser.add_argument("--inline-report", action="store_true", help="list inlined call sites on stderr")
+    arg_parser.add_argument("--tree-shake", action="store_true", help="drop functions, structs and enums not reachable from main or @export functions")
+    arg_parser.add_argument("--tree-shake-report", action="store_true", help="list removed declarations and their count on stderr")
+    arg_parser.add_argument("--layout-structs", action="store_true", help="reorder struct fields to minimize padding (except @repr_c structs)")
+    arg_parser.add_argument("--layout-report", action="store_true", help="print struct sizes and padding before and after on stderr")
+    arg_parser.add_argument("--cse", action="store_true", help="evaluate repeated pure expressions and @pure calls once per block")
+    arg_parser.add_argument("--optimized-c", action="store_true", help="emit static/inline/const hints and forward declarations")
+    arg_parser.add_argument("--unity", action="store_true", help="paste the runtime into the output for a single-file build")
+    arg_parser.add_argument("--no-static-tables", action="store_true", help="keep constant local arrays on the stack")
+    arg_parser.add_argument("--line-directives", action="store_true", help="emit #line directives pointing back into the .bug file")
+    arg_parser.add_argument("--source-map", metavar="FILE", help="write a JSON map from C lines to .bug lines and columns (implies --line-directives)")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=1, help="generate function bodies in this many processes")
+    arg_parser.add_argument("--openmp", action="store_true", help="run independent counted loops as OpenMP parallel for / simd loops (build with -fopenmp)")
+    arg_parser.add_argument("--openmp-report", action="store_true", help="list the loops turned into OpenMP loops on stderr")
+    arg_parser.add_argument("--instrument", action="store_true", help="count function calls, loop iterations, branches and match arms; the program writes them to $BUG_PROFILE or --profile-output at exit")
+    arg_parser.add_argument("--profile-output", metavar="FILE", default="bug.profile", help="where an --instrument build writes its profile unless $BUG_PROFILE is set")
+    arg_parser.add_argument("--profile-use", metavar="FILE", action="append", help="optimize with a profile from an --instrument build made with the same other flags (repeatable)")
+    arg_parser.add_argument("--profile-report", action="store_true", help="list profile-guided decisions on stderr")
+    return arg_parser.parse_args()
+
+
 def main():
-    with open(argv[1], "r") as f:
+    args = parse_args()
+    with open(args.file, "r") as f:
         data = f.read()
-    result = parser.parse(data)
+    result = bug_pratt.parse(data) if args.parser == "pratt" else parse(data)
+    if args.tree_shake:
+        shaker = TreeShaker()
+        shaker.run(result)
+        if args.tree_shake_report:
+            print(shaker.format_report(), file=stderr)
+    if args.layout_structs:
+        layout = StructLayout()
+        layout.run(result)
+        if args.layout_report:
+            print(layout.format_report(), file=stderr)
+    if args.tail_calls:
+        TailCallEliminator().run(result)
+    if args.inline:
+        inliner = Inliner(args.inline_size, args.inline_once_size)
+        inliner.run(result)
+        if args.inline_report:
+            print(inliner.format_report(), file=stderr)
+    if args.cse:
+        CommonSubexpressionEliminator().run(result)
+    if not args.no_static_tables:
+        ConstantTables().run(result)
+    if args.profile_use:
+        optimizer = ProfileGuidedOptimizer(load_profile(args.profile_use))
+        optimizer.run(result)
+        if args.profile_report:
+            print(optimizer.format_report(), file=stderr)
+    if args.instrument:
+        Instrumenter(args.profile_output).run(result)
+    if args.openmp:
+        parallel_loops = ParallelLoops()
+        parallel_loops.run(result)
+        if args.openmp_report:
+            print(parallel_loops.format_report(), file=stderr)
     # print(result)
-    root = Visitor().visit(result)
-    print(root)
+    source_name = None
+    if args.line_directives or args.source_map:
+        source_name = args.file.replace("\\", "\\\\").replace('"', '\\"')
+    visitor = Visitor(optimized=args.optimized_c, unity=args.unity, source_name=source_name, jobs=args.jobs)
+    root = visitor.visit(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(root + "\n")
+    else:
+        print(root)
+    if args.source_map:
+        with open(args.source_map, "w") as f:
+            json.dump(source_map(root, args.file, args.output), f, indent=1)
 
 
 if __name__ == "__main__":
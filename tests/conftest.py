@@ -0,0 +1,39 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def generate_c(path, *flags):
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "generate.py"), str(path), *flags],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    )
+    return result.stdout
+
+
+@pytest.fixture
+def build(tmp_path):
+    # Generates, compiles and runs a .bug program; returns (C code, stdout).
+    if shutil.which("cc") is None:
+        pytest.skip("no C compiler")
+
+    def run(source, *flags, opt=0, env=None):
+        path = tmp_path / "program.bug"
+        path.write_text(source)
+        code = generate_c(path, *flags)
+        c_file = tmp_path / "program.c"
+        c_file.write_text(code)
+        exe = tmp_path / "program"
+        sources = [c_file] if "--unity" in flags else [c_file, os.path.join(ROOT, "bug.c")]
+        extra = ["-fopenmp"] if "--openmp" in flags else []
+        subprocess.run(["cc", f"-O{opt}", "-w", *extra, "-I", ROOT, *sources, "-o", exe], check=True)
+        result = subprocess.run([exe], capture_output=True, text=True, cwd=tmp_path, env=env, check=True)
+        return code, result.stdout
+
+    return run
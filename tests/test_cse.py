@@ -0,0 +1,97 @@
+PURE_REUSE = """
+@pure fn square(x: i32) -> i32 { return x * x; }
+fn main() -> i32 {
+  let a: i32 = 7;
+  let b: i32 = square(a) + 1;
+  let c: i32 = square(a) + 1;
+  print_int(b + c);
+  return 0;
+}
+"""
+
+IMPURE_BARRIER = """
+let g: i32 = 1;
+@pure fn twice(x: i32) -> i32 { return x * 2; }
+fn bump() -> void { g = g + 10; }
+fn main() -> i32 {
+  let b: i32 = twice(g) + 1;
+  bump();
+  let c: i32 = twice(g) + 1;
+  print_int(b);
+  println("");
+  print_int(c);
+  return 0;
+}
+"""
+
+CALL_ORDER = """
+fn say(x: i32) -> i32 { print_int(x); return x; }
+fn main() -> i32 {
+  let a: i32 = say(1) + say(2);
+  let b: i32 = say(1) + say(2);
+  print_int(a + b);
+  return 0;
+}
+"""
+
+ARRAY_MUTATION = """
+@pure fn first(xs: *i32) -> i32 { return xs[0]; }
+fn fill(xs: *i32, v: i32) -> void { xs[0] = v; }
+fn main() -> i32 {
+  let a: [i32; 4] = [1, 2, 3, 4];
+  let s1: i32 = first(a) + 1;
+  fill(a, 7);
+  let s2: i32 = first(a) + 1;
+  print_int(s1);
+  println("");
+  print_int(s2);
+  return 0;
+}
+"""
+
+
+def test_pure_call_is_reused(build):
+    code, output = build(PURE_REUSE, "--cse")
+    assert code.count("square(a)") == 1
+    assert output == build(PURE_REUSE)[1] == "100"
+
+
+def test_impure_call_is_a_barrier_for_globals(build):
+    code, output = build(IMPURE_BARRIER, "--cse")
+    assert code.count("twice(g)") == 2
+    assert output == build(IMPURE_BARRIER)[1] == "3\n23"
+
+
+def test_impure_calls_keep_their_order_and_count(build):
+    code, output = build(CALL_ORDER, "--cse")
+    assert code.count("say(1)") == 2 and code.count("say(2)") == 2
+    assert output == build(CALL_ORDER)[1] == "12126"
+
+
+def test_array_written_by_impure_call_is_reread(build):
+    code, output = build(ARRAY_MUTATION, "--cse")
+    assert code.count("first(a)") == 2
+    assert output == build(ARRAY_MUTATION)[1] == "2\n8"
+
+PURE_READS_GLOBAL = """
+let g: i32 = 1;
+@pure fn getg(k: i32) -> i32 { return g + k; }
+fn set(v: i32) -> void { g = v; }
+fn main() -> i32 {
+  let a: i32 = getg(0) + 1;
+  g = 5;
+  let b: i32 = getg(0) + 1;
+  set(9);
+  let c: i32 = getg(0) + 1;
+  print_int(a);
+  print_int(b);
+  print_int(c);
+  return 0;
+}
+"""
+
+
+def test_pure_call_reading_a_global_is_reevaluated(build):
+    code, output = build(PURE_READS_GLOBAL, "--cse")
+    assert code.count("getg(0)") == 3
+    assert output == build(PURE_READS_GLOBAL)[1] == "2610"
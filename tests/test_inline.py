@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+SHADOWED_GLOBAL = """
+let g: i32 = 10;
+fn get() -> i32 { return g; }
+fn main() -> i32 {
+  let g: i32 = 5;
+  print_int(get() + 0 * g);
+  return 0;
+}
+"""
+
+EXPORTED_HELPER = """
+@export fn helper(x: i32) -> i32 { return x + 1; }
+fn main() -> i32 {
+  print_int(helper(1));
+  return 0;
+}
+"""
+
+SMALL_HELPERS = """
+fn add(a: i32, b: i32) -> i32 { let s: i32 = a + b; return s; }
+fn main() -> i32 {
+  let s: i32 = 3;
+  print_int(add(s, 4));
+  return 0;
+}
+"""
+
+
+def test_global_is_not_captured_by_caller_local(build):
+    code, output = build(SHADOWED_GLOBAL, "--inline")
+    assert output == build(SHADOWED_GLOBAL)[1] == "10"
+
+
+def test_exported_function_is_kept(build):
+    code, output = build(EXPORTED_HELPER, "--inline", "--optimized-c")
+    assert "int helper(const int x) {" in code
+    assert output == "2"
+
+
+def test_callee_locals_are_renamed(build):
+    code, output = build(SMALL_HELPERS, "--inline")
+    assert "add(" not in code.split("int main")[1]
+    assert output == build(SMALL_HELPERS)[1] == "7"
+
+NESTED_EARLY_RETURN = """
+fn b(x: i32) -> i32 {
+  if x < 0 {
+    return 0;
+  }
+  return x * 2;
+}
+fn a(x: i32) -> i32 { return b(x) + 1; }
+fn main() -> i32 {
+  print_int(a(1));
+  print_int(a(-1));
+  return 0;
+}
+"""
+
+
+def test_labels_are_renamed_per_expansion(build):
+    code, output = build(NESTED_EARLY_RETURN, "--inline")
+    labels = [line.strip() for line in code.splitlines() if line.strip().endswith(": ;")]
+    assert len(labels) > 2
+    assert len(labels) == len(set(labels))
+    assert output == build(NESTED_EARLY_RETURN)[1] == "31"
+
+
+def test_report_names_call_sites(tmp_path):
+    path = tmp_path / "program.bug"
+    path.write_text(NESTED_EARLY_RETURN)
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "generate.py"), str(path), "--inline", "--inline-report"],
+        capture_output=True, text=True, check=True,
+    )
+    assert "inlined a into main at line 10 column 13 (size 22)" in result.stderr.splitlines()
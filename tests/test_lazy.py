@@ -0,0 +1,57 @@
+import glob
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bug_ast import FnDeclAST, pack  # noqa: E402
+from bug_lazy import LazyBody, force, parse_lazy  # noqa: E402
+from bug_parser import parse  # noqa: E402
+from parsers import ProgramGenerator  # noqa: E402
+
+BENCHMARKS = sorted(glob.glob(os.path.join(ROOT, "benchmarks", "*.bug"))) + [os.path.join(ROOT, "example.bug")]
+
+EDGE_CASES = {
+    "short body": "fn b() -> void {;}\nfn main() -> i32 { return 0; }",
+    "braces in strings": 'fn f() -> void { println("}{ }"); println(\'{\'); }\nfn g() -> i32 { return 1; }',
+    "braces in comments": "fn f() -> i32 {\n  // } closing brace\n  return 1; // {\n}\n// fn g() { }\nfn h() -> i32 { return 2; }",
+    "fn in names and strings": 'fn fnord() -> i32 { let fn_x: i32 = 1; println("fn x() {"); return fn_x; }',
+    "nested blocks": "fn f(x: i32) -> i32 {\n  if x { loop { x = x - 1; } while x > 0; } else { return 2; }\n  return match x { 1 => 2, * => 3 };\n}",
+    "struct and enum braces": "struct P { x: i32 }\nenum E { A = 0 }\nfn f() -> P { return new P { x: A }; }",
+}
+
+
+def assert_same(source):
+    expected = parse(source)
+    lazy = parse_lazy(source)
+    assert expected is not None
+    assert lazy is not None
+    assert pack(force(lazy).children) == pack(expected.children)
+
+
+@pytest.mark.parametrize("path", BENCHMARKS, ids=os.path.basename)
+def test_benchmark_programs(path):
+    with open(path) as f:
+        assert_same(f.read())
+
+
+@pytest.mark.parametrize("source", EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_edge_cases(source):
+    assert_same(source)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_programs(seed):
+    generator = ProgramGenerator(seed)
+    for _ in range(30):
+        assert_same(generator.program(6))
+
+
+def test_bodies_are_deferred():
+    module = parse_lazy(EDGE_CASES["braces in comments"])
+    bodies = [decl.children[3] for decl in module.children if isinstance(decl, FnDeclAST)]
+    assert all(isinstance(body, LazyBody) for body in bodies)
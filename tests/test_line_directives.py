@@ -0,0 +1,80 @@
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import ROOT, generate_c
+from generate import LINE_DIRECTIVE
+
+PROGRAM = """struct Pair { a: i32, b: i32 }
+let scale: i32 = 3;
+fn total(n: i32) -> i32 {
+  let sum: i32 = 0;
+  let i: i32 = 0;
+  loop {
+    if i % 2 == 0 {
+      sum = sum + i * scale;
+    } else if i % 3 == 0 {
+      sum = sum - 1;
+    } else {
+      sum = sum + 1;
+    }
+    i = i + 1;
+  } while i < n;
+  return sum;
+}
+fn main() -> i32 {
+  let p: Pair = new Pair { a: total(10), b: 2 };
+  match p.b { 2 => print_int(p.a), * => print_int(0) };
+  return 0;
+}
+"""
+
+
+def directives(code):
+    return [line for line in code.splitlines() if line.startswith("#line")]
+
+
+@pytest.mark.parametrize("flags", [(), ("--optimized-c",), ("--optimized-c", "--unity")], ids=" ".join)
+def test_directives_compile_and_keep_behaviour(build, tmp_path, flags):
+    code, output = build(PROGRAM, "--line-directives", *flags)
+    assert output == build(PROGRAM, *flags)[1] == "61"
+    lines = directives(code)
+    assert lines and all(LINE_DIRECTIVE.match(line) for line in lines)
+    numbers = {int(LINE_DIRECTIVE.match(line).group(1)) for line in lines}
+    # Every statement line of the program, including else-if and else bodies.
+    assert {3, 4, 5, 6, 7, 8, 9, 10, 12, 14, 16, 18, 19, 20, 21} <= numbers
+    assert re.search(r'#line 8 ".*program\.bug" // col 7\n\s*sum = sum \+ i \* scale;', code)
+
+
+def test_source_map(tmp_path):
+    path = tmp_path / "program.bug"
+    path.write_text(PROGRAM)
+    map_path = tmp_path / "program.map.json"
+    code = generate_c(path, "--source-map", str(map_path))
+    source_map = json.loads(map_path.read_text())
+    assert source_map["source"] == str(path)
+    c_lines = code.split("\n")
+    by_c_line = {entry["c_line"]: (entry["line"], entry["column"]) for entry in source_map["mappings"]}
+    for number, text in enumerate(c_lines, start=1):
+        if "sum = sum - 1;" in text:
+            assert by_c_line[number] == (10, 7)
+        if "print_int(p.a)" in text:
+            assert by_c_line[number][0] == 20
+    assert all(not c_lines[number - 1].startswith("#line") for number in by_c_line)
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="no C compiler")
+def test_compiler_diagnostics_point_into_the_bug_file(tmp_path):
+    path = tmp_path / "program.bug"
+    path.write_text("fn main() -> i32 {\n  let x: i32 = 1;\n  missing(x);\n  return 0;\n}\n")
+    c_file = tmp_path / "program.c"
+    c_file.write_text(generate_c(path, "--line-directives"))
+    result = subprocess.run(
+        ["cc", "-c", "-Werror=implicit-function-declaration", "-I", ROOT, c_file, "-o", tmp_path / "program.o"],
+        capture_output=True, text=True,
+    )
+    assert result.returncode != 0
+    assert f"{path}:3:" in result.stderr
@@ -0,0 +1,29 @@
+import glob
+import os
+
+import pytest
+
+from conftest import ROOT
+
+PROGRAMS = sorted(
+    path for path in glob.glob(os.path.join(ROOT, "benchmarks", "*.bug"))
+    if os.path.exists(path[:-len(".bug")] + ".expected")
+)
+
+
+@pytest.mark.parametrize("path", PROGRAMS, ids=os.path.basename)
+def test_openmp_output_matches_serial(build, path):
+    with open(path) as f:
+        source = f.read()
+    with open(path[:-len(".bug")] + ".expected") as f:
+        expected = f.read()
+    _, serial = build(source, opt=2)
+    _, parallel = build(source, "--openmp", opt=2)
+    assert serial == expected
+    assert parallel == serial
+
+
+def test_independent_loops_become_parallel(build):
+    with open(os.path.join(ROOT, "benchmarks", "array_map.bug")) as f:
+        code, _ = build(f.read(), "--openmp", opt=2)
+    assert "#pragma omp parallel for" in code
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import generate  # noqa: E402
+from bug_parser import parse  # noqa: E402
+from codegen_scaling import synthesize  # noqa: E402
+
+OPTIONS = [
+    {"optimized": False, "source_name": None},
+    {"optimized": True, "source_name": None},
+    {"optimized": False, "source_name": "synthetic.bug"},
+    {"optimized": True, "source_name": "synthetic.bug"},
+]
+
+
+@pytest.fixture(scope="module")
+def module():
+    return parse(synthesize(64))
+
+
+@pytest.mark.parametrize("options", OPTIONS, ids=lambda options: f"optimized={options['optimized']},lines={bool(options['source_name'])}")
+def test_parallel_output_is_identical(module, options):
+    serial = generate.Visitor(jobs=1, **options).visit(module)
+    assert generate.Visitor(jobs=2, **options).visit(module) == serial
+
+
+def test_shards_sent_as_packed_trees(module, monkeypatch):
+    # Platforms without fork send each shard as a marshalled pack() tree.
+    monkeypatch.setattr(generate.multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    monkeypatch.setattr(generate, "emit_range", None)
+    for options in (OPTIONS[0], OPTIONS[3]):
+        serial = generate.Visitor(jobs=1, **options).visit(module)
+        assert generate.Visitor(jobs=3, **options).visit(module) == serial
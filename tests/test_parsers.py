@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import bug_parser  # noqa: E402
+import bug_pratt  # noqa: E402
+from bug_ast import pack  # noqa: E402
+from parsers import ProgramGenerator  # noqa: E402
+
+EDGE_CASES = {
+    "empty decls": ";\nfn main() -> i32 { ; return 0; ; }\n;",
+    "precedence": "fn f() -> i32 { return 1 + 2 * 3 - 4 / 5 % 6 < 7 == 8 > 9 && !a || -b != +c <= d >= e; }",
+    "left associative": "fn f() -> i32 { return a - b - c / d / e; }",
+    "postfix binds tightest": "fn f() -> i32 { return -a.b[c].d * !x[1][2]; }",
+    "unary chains": "fn f() -> i32 { return - - !!x; }",
+    "string booleans": 'let t: bool = "true"; let f: string = "false";',
+    "string type": "let s: string = 'x'; fn g(a: string, b: [string; 2]) -> string { return a; }",
+    "types": "fn f(a: [[i32; 2]; 3], b: [f64], c: *i32, d: Point) -> void { return 0; }",
+    "else if chains": "fn f() -> void { if a { x = 1; } else if b { x = 2; } else if c { x = 3; } else { x = 4; } }",
+    "match": "fn f() -> i32 { return match x { 1 => a, b + 1 => c(d), * => 0 }; }",
+    "assignment targets": "fn f() -> void { a = 1; a[i + 1] = 2; a.b = 3; a.b[2].c = 4; }",
+    "attributes": "@pure @export fn f() -> i32 { return 1; } @repr_c struct S { a: i32, b: char }",
+    "enum": "enum E { A = 0, B = 1 + 2 }",
+    "new struct": "fn f() -> void { let p: P = new P { x: 1, y: [1, 2] }; }",
+    "loop": "fn f() -> void { loop { loop { x = x + 1; } while x < 2; } while y; }",
+    "comments and positions": "// top\nfn f() -> i32 {\n\t// inner\n  return   a\n  +\n  b; // tail\n}\n",
+    "calls": "fn f() -> void { g(); g(1); g(1, h(2, 3), [4]); }",
+}
+
+ERRORS = {
+    "missing semicolon": "fn f() -> i32 { return 1 }",
+    "illegal character": "fn f() -> i32 {\n  return 1 $ 2;\n}",
+    "empty module": "",
+    "unexpected eof": "fn f() -> i32 { return 1;",
+    "bad assignment target": "fn f() -> void { g() = 1; }",
+    "bare return": "fn f() -> void { return; }",
+}
+
+
+def parse_both(source):
+    return bug_parser.parse(source), bug_pratt.parse(source)
+
+
+@pytest.mark.parametrize("source", EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_edge_cases(source):
+    expected, actual = parse_both(source)
+    assert expected is not None
+    assert actual is not None
+    assert pack(actual.children) == pack(expected.children)
+
+
+@pytest.mark.parametrize("source", ERRORS.values(), ids=ERRORS.keys())
+def test_errors(source, capsys):
+    expected = bug_parser.parse(source)
+    expected_output = capsys.readouterr().out
+    actual = bug_pratt.parse(source)
+    assert expected is None and actual is None
+    assert capsys.readouterr().out == expected_output
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_programs(seed):
+    generator = ProgramGenerator(seed)
+    for _ in range(40):
+        source = generator.program(8)
+        expected, actual = parse_both(source)
+        assert expected is not None, source
+        assert actual is not None, source
+        assert pack(actual.children) == pack(expected.children), source
@@ -0,0 +1,33 @@
+import os
+
+from bug_profile import load_profile
+
+PROGRAM = """
+fn main() -> i32 {
+  let i: i32 = 0;
+  loop {
+    i = i + 1;
+  } while i < 10;
+  print_int(i);
+  return 0;
+}
+"""
+
+
+def test_profile_goes_to_profile_output(build, tmp_path):
+    path = tmp_path / "out" / "run.profile"
+    path.parent.mkdir()
+    env = {key: value for key, value in os.environ.items() if key != "BUG_PROFILE"}
+    code, output = build(PROGRAM, "--instrument", "--profile-output", str(path), env=env)
+    assert output == "10"
+    assert "__bug" not in code
+    assert not (tmp_path / "bug.profile").exists()
+    assert load_profile([path]) == {"main:entry": 1, "main:loop0": 10}
+
+
+def test_environment_overrides_profile_output(build, tmp_path):
+    path = tmp_path / "env.profile"
+    env = dict(os.environ, BUG_PROFILE=str(path))
+    build(PROGRAM, "--instrument", "--profile-output", str(tmp_path / "unused.profile"), env=env)
+    assert load_profile([path])["main:loop0"] == 10
+    assert not (tmp_path / "unused.profile").exists()
@@ -0,0 +1,121 @@
+import pytest
+
+from bug_ast import GotoStmtAST
+from bug_parser import parse
+from bug_pyexec import PythonLowering, load
+
+UNTYPED_DIVISION = """
+fn div(x: i32) -> i32 {
+  return match x { 1 => 7, * => -7 } / 2;
+}
+fn rem(x: i32) -> i32 {
+  return match x { 1 => 7, * => -7 } % 2;
+}
+fn fdiv(x: f64) -> f64 {
+  return match x { * => x } / 2.0;
+}
+"""
+
+
+def test_untyped_integer_division_truncates_like_c():
+    program = load(UNTYPED_DIVISION)
+    assert program.div(1) == 3
+    assert program.div(2) == -3
+    assert program.rem(2) == -1
+    assert program.fdiv(5.0) == 2.5
+
+
+def test_unsupported_node_names_the_node():
+    lowering = PythonLowering(parse("fn main() -> i32 { return 0; }"))
+    with pytest.raises(Exception, match="No visit_GotoStmtAST method"):
+        lowering.visit(GotoStmtAST("done"))
+
+
+def test_i32_and_i64_wrap_around():
+    program = load("""
+fn add32(a: i32, b: i32) -> i32 { return a + b; }
+fn mul64(a: i64, b: i64) -> i64 { return a * b; }
+fn narrow(a: i64) -> i32 { let x: i32 = a; return x; }
+fn neg(a: i32) -> i32 { return -a; }
+""")
+    assert program.add32(2147483647, 1) == -2147483648
+    assert program.mul64(9223372036854775807, 2) == -2
+    assert program.narrow(4294967297) == 1
+    assert program.neg(-2147483648) == -2147483648
+
+
+def test_loops():
+    program = load("""
+fn sum(n: i32) -> i32 {
+  let i: i32 = 0;
+  let total: i32 = 0;
+  loop {
+    total = total + i;
+    i = i + 1;
+  } while i < n;
+  return total;
+}
+""")
+    assert program.sum(10) == 45
+    # The condition is checked first, like the C backend's while loop.
+    assert program.sum(0) == 0
+
+
+def test_match():
+    program = load("""
+fn classify(x: i32) -> i32 {
+  return match x { 0 => 10, 1 + 1 => 20, * => 30 };
+}
+fn partial(x: i32) -> i32 {
+  let y: i32 = 0;
+  match x { 1 => print_int(x) };
+  return y;
+}
+""")
+    assert [program.classify(x) for x in (0, 2, 5)] == [10, 20, 30]
+    program.partial(1)
+    program.partial(2)
+    assert program.read_output() == "1"
+
+
+def test_structs_are_values():
+    program = load("""
+struct Point { x: i32, y: i32 }
+struct Line { a: Point, b: Point }
+fn make(x: i32) -> Point { return new Point { x: x }; }
+fn mv(p: Point) -> i32 { p.x = p.x + 100; return p.x; }
+fn length(l: Line) -> i32 { let c: Line = l; c.a.x = 0; return l.b.x - l.a.x; }
+""")
+    p = program.make(3)
+    assert (p.x, p.y) == (3, 0)
+    assert program.mv(p) == 103
+    assert p.x == 3
+    line = program.Line(program.make(1), program.make(5))
+    assert program.length(line) == 4
+    assert line.a.x == 1
+
+
+def test_enums():
+    program = load("""
+enum Color { Red = 0, Green = 1, Blue = 4 }
+fn next(c: Color) -> Color {
+  return match c { Red => Green, Green => Blue, * => Red };
+}
+""")
+    assert (program.Red, program.Green, program.Blue) == (0, 1, 4)
+    assert program.next(program.Green) == program.Blue
+    assert program.next(program.Blue) == program.Red
+
+
+def test_output_buffer():
+    program = load("""
+fn main() -> i32 {
+  println("hi");
+  print_int(-3);
+  print_f64(0.5);
+  return 0;
+}
+""")
+    assert program.main() == 0
+    assert program.read_output() == "hi\n-30.500000000"
+    assert program.read_output() == ""
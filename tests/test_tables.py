@@ -0,0 +1,80 @@
+READ_ONLY = """
+fn lookup(i: i32) -> i32 {
+  let primes: [i32; 5] = [2, 3, 5, 7, 11];
+  return primes[i];
+}
+fn main() -> i32 {
+  print_int(lookup(0) + lookup(4));
+  return 0;
+}
+"""
+
+WRITTEN = """
+fn change(xs: *i32) -> void { xs[0] = 9; }
+fn written() -> i32 {
+  let xs: [i32; 3] = [1, 2, 3];
+  xs[1] = 5;
+  return xs[1];
+}
+fn passed() -> i32 {
+  let ys: [i32; 3] = [1, 2, 3];
+  change(ys);
+  return ys[0];
+}
+fn main() -> i32 {
+  print_int(written());
+  print_int(passed());
+  return 0;
+}
+"""
+
+SHARED = """
+fn f(i: i32) -> i32 {
+  let a: [i32; 3] = [4, 5, 6];
+  return a[i];
+}
+fn g(i: i32) -> i32 {
+  let b: [i32; 3] = [4, 5, 6];
+  return b[i];
+}
+fn main() -> i32 {
+  print_int(f(1) + g(2));
+  return 0;
+}
+"""
+
+SHADOWS_GLOBAL = """
+let t: [i32; 2] = [7, 8];
+fn main() -> i32 {
+  print_int(t[0]);
+  let t: [i32; 2] = [1, 2];
+  print_int(t[0]);
+  return 0;
+}
+"""
+
+
+def test_read_only_table_is_hoisted(build):
+    code, output = build(READ_ONLY)
+    assert "static const int _table_lookup_primes[5]" in code
+    assert "return _table_lookup_primes[i];" in code
+    assert output == build(READ_ONLY, "--no-static-tables")[1] == "13"
+
+
+def test_written_or_passed_tables_stay_local(build):
+    code, output = build(WRITTEN)
+    assert "_table_" not in code
+    assert output == "59"
+
+
+def test_identical_tables_are_shared(build):
+    code, output = build(SHARED)
+    assert code.count("static const int _table_") == 1
+    assert "return _table_f_a[i];" in code.split("int g(")[1]
+    assert output == "11"
+
+
+def test_local_shadowing_a_global_is_not_hoisted(build):
+    code, output = build(SHADOWS_GLOBAL)
+    assert "_table_" not in code
+    assert output == build(SHADOWS_GLOBAL, "--no-static-tables")[1] == "71"
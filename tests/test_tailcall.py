@@ -0,0 +1,56 @@
+IF_ELSE = """
+fn gcd(a: i32, b: i32) -> i32 {
+  if b == 0 {
+    return a;
+  } else {
+    return gcd(b, a % b);
+  }
+}
+fn sum_to(n: i32, acc: i32) -> i32 {
+  if n == 0 {
+    return acc;
+  }
+  return sum_to(n - 1, acc + n);
+}
+fn main() -> i32 {
+  print_int(gcd(1071, 462));
+  println("");
+  print_int(sum_to(1000, 0));
+  return 0;
+}
+"""
+
+VOID = """
+fn countdown(n: i32) -> void {
+  if n > 0 {
+    print_int(n);
+    countdown(n - 1);
+  }
+}
+fn main() -> i32 {
+  countdown(5);
+  return 0;
+}
+"""
+
+
+def body_of(code, name):
+    return code.split(f"{name}(")[1].split("\n}")[0]
+
+
+def test_if_else_tail_calls(build):
+    code, output = build(IF_ELSE, "--tail-calls")
+    assert "gcd(" not in body_of(code, "gcd")
+    assert "sum_to(" not in body_of(code, "sum_to")
+    assert output == build(IF_ELSE)[1] == "21\n500500"
+
+
+def test_void_tail_call(build):
+    code, output = build(VOID, "--tail-calls")
+    assert "countdown(" not in body_of(code, "countdown")
+    assert output == build(VOID)[1] == "54321"
+
+
+def test_void_tail_call_then_inline(build):
+    code, output = build(VOID, "--tail-calls", "--inline")
+    assert output == "54321"
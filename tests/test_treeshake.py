@@ -0,0 +1,42 @@
+from bug_parser import parse
+from bug_treeshake import TreeShaker
+from conftest import generate_c
+
+PROGRAM = """
+enum Color { Red = 0, Green = 1 }
+enum Unused { U = 0 }
+struct Inner { v: i32 }
+struct Outer { inner: Inner }
+struct Dead { x: i32 }
+let g: i32 = seed();
+fn seed() -> i32 { return offset(); }
+fn offset() -> i32 { return 1; }
+fn dead_helper() -> i32 { return 1; }
+fn dead_caller() -> i32 { return dead_helper(); }
+@export fn api(o: Outer) -> i32 { return helper(o.inner.v); }
+fn helper(x: i32) -> i32 { return x; }
+fn main() -> i32 { print_int(Red + g); return 0; }
+"""
+
+
+def shake(source):
+    module = parse(source)
+    shaker = TreeShaker()
+    shaker.run(module)
+    return module, shaker
+
+
+def test_unreachable_declarations_are_removed():
+    module, shaker = shake(PROGRAM)
+    assert sorted(name for _, name, _ in shaker.removed) == ["Dead", "Unused", "dead_caller", "dead_helper"]
+    kept = [decl.children[0] for decl in module.children]
+    assert kept == ["Color", "Inner", "Outer", "g", "seed", "offset", "api", "helper", "main"]
+    assert "removed 4 declarations" in shaker.format_report()
+
+
+def test_functions_called_from_global_initializers_are_kept(tmp_path):
+    path = tmp_path / "program.bug"
+    path.write_text(PROGRAM)
+    code = generate_c(path, "--tree-shake")
+    assert "int seed() {" in code and "int offset() {" in code
+    assert "dead_helper" not in code